@@ -0,0 +1,40 @@
+"""
+Backfill derived data on an existing database.
+
+Usage:
+    python -m app.commands.backfill fts
+    python -m app.commands.backfill click-counts
+"""
+import argparse
+from sqlmodel import Session
+from app.config.db import engine
+from app.services.search_index import rebuild_product_fts
+from app.services.storage import SyncStorageManager
+
+
+def backfill_fts():
+    indexed = rebuild_product_fts(engine)
+    print(f"[INFO] Indexed {indexed} products in the full-text index.")
+
+
+def backfill_click_counts():
+    with Session(engine) as session:
+        products = SyncStorageManager(session).rebuild_click_counts()
+    print(f"[INFO] Rebuilt click counters for {products} products.")
+
+
+TASKS = {
+    "fts": backfill_fts,
+    "click-counts": backfill_click_counts,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill derived data on an existing database.")
+    parser.add_argument("task", choices=sorted(TASKS))
+    args = parser.parse_args()
+    TASKS[args.task]()
+
+
+if __name__ == "__main__":
+    main()
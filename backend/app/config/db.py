@@ -1,11 +1,145 @@
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+import os
 
-DATABASE_URL = "sqlite:///data/web_scraper.db" # TODO: Move to PostgreSQL
-engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///data/web_scraper.db")
+# Used by async endpoints, derived from DATABASE_URL when not set
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL")
+
+# asyncio drivers for the async engine, per database backend
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+# Connection pool settings, used for server databases such as PostgreSQL
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# SQLite tuning applied to every new connection, SQLITE_TUNING=false keeps SQLite's defaults.
+# WAL lets readers run alongside the single writer and, with synchronous=NORMAL,
+# commits no longer fsync; busy_timeout makes writers wait for the lock instead
+# of failing with "database is locked".
+SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "true").lower() in ("1", "true", "yes")
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are KiB, so -65536 is a 64 MiB page cache per connection
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", "-65536")),
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+def normalize_database_url(url: str) -> str:
+    # Hosting providers often hand out postgres:// URLs, which SQLAlchemy no longer accepts
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+def async_database_url(url: str) -> str:
+    """
+    The same database as `url`, addressed through its asyncio driver.
+    """
+    parsed = make_url(normalize_database_url(url))
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"No asyncio driver known for {backend}, set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+def engine_options(url: str) -> dict:
+    """
+    Keyword arguments for `create_engine` depending on the database backend.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if backend == "postgresql":
+        # Timestamps are stored without time zone and read back as UTC
+        if parsed.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"timezone": "utc"}}
+        else:
+            options["connect_args"] = {"options": "-c timezone=utc"}
+    return options
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def create_db_engine(url: str, sqlite_tuning: bool = SQLITE_TUNING):
+    url = normalize_database_url(url)
+    new_engine = create_engine(url, echo=False, **engine_options(url))
+    if sqlite_tuning and new_engine.dialect.name == "sqlite":
+        event.listen(new_engine, "connect", apply_sqlite_pragmas)
+    return new_engine
+
+def create_async_db_engine(url: str, sqlite_tuning: bool = SQLITE_TUNING):
+    url = normalize_database_url(url)
+    new_engine = create_async_engine(url, echo=False, **engine_options(url))
+    if sqlite_tuning and new_engine.dialect.name == "sqlite":
+        # Pool events are emitted by the sync engine the async engine wraps
+        event.listen(new_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return new_engine
+
+DATABASE_URL = normalize_database_url(DATABASE_URL)
+engine = create_db_engine(DATABASE_URL)
+
+ASYNC_DATABASE_URL = normalize_database_url(ASYNC_DATABASE_URL or async_database_url(DATABASE_URL))
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
 
 def init_db():
+    from app.services.search_index import init_product_fts, init_product_trgm
+    from app.services.storage import SyncStorageManager
+
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+    init_product_fts(engine)
+    init_product_trgm(engine)
+    with Session(engine) as session:
+        SyncStorageManager(session).ensure_click_counts()
+
+def add_missing_columns():
+    """
+    create_all() does not alter existing tables, so add nullable columns that
+    were introduced after the database was created.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                print(f"[INFO] Added column {table.name}.{column.name}")
 
 def get_session():
     with Session(engine, expire_on_commit=False) as session:
         yield session
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -1,20 +1,28 @@
-from fastapi import FastAPI, Depends, BackgroundTasks
+from fastapi import FastAPI, Depends, Response
 from fastapi.concurrency import run_in_threadpool
 from typing import Union, Annotated, List, Dict
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timedelta, timezone
-from app.config.db import init_db, get_session
+from app.config.db import init_db, get_async_session, engine, async_engine
 from app.config.scraper import init_scraper_config
 from app.routers import admin, clicks, products, api_requests, visitors, websockets
 from app.middleware.visitor import VisitorMiddleware
-from app.providers.flipkart import FlipkartScraper
-from app.providers.amazon import AmazonAPIWrapper
-from app.services.storage import StorageManager
-from app.services.settings import get_scrape_cooldown
+from app.services.storage import StorageManager, latest_timestamp
+from app.services.settings import config_store
+from app.services.fx import fx_rates
+from app.services.http import http_client
+from app.services.parse_pool import parse_pool
+from app.services.visitor_log import visitor_writer
+from app.services.click_log import click_writer
+from app.services.request_log import request_log_writer
+from app.services.scrape_jobs import scrape_registry
+from app.services.prewarm import prewarmer
+from app.services.db_maintenance import sqlite_maintenance
+from app.services.scheduler import INTERACTIVE, SHED_RETRY_AFTER_SECONDS, scrape_scheduler
 from app.services.websocket import manager as websocket_manager
 from app.models.product import Product
 from app.models.click import Click
-from app.models.scraper_config import ScraperConfig
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -23,15 +31,41 @@ import os
 import uuid
 import asyncio
 
-SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Called on startup
     init_db()
     init_scraper_config()
+    with Session(engine) as session:
+        config_store.load(session)
+    await run_in_threadpool(fx_rates.refresh)
+    fx_refresh_task = asyncio.create_task(fx_rates.run_refresh_loop())
+    config_refresh_task = asyncio.create_task(config_store.run_refresh_loop())
+    await http_client.start()
+    parse_pool.start()
+    await visitor_writer.start()
+    await click_writer.start()
+    await request_log_writer.start()
+    await websocket_manager.start()
+    await scrape_scheduler.start()
+    prewarm_task = asyncio.create_task(prewarmer.run_loop())
+    maintenance_task = asyncio.create_task(sqlite_maintenance.run_loop())
     yield
-    # Called on shutdown if needed
+    # Called on shutdown
+    fx_refresh_task.cancel()
+    config_refresh_task.cancel()
+    prewarm_task.cancel()
+    maintenance_task.cancel()
+    await scrape_scheduler.stop()
+    await websocket_manager.stop()
+    await visitor_writer.stop()
+    await click_writer.stop()
+    await request_log_writer.stop()
+    await http_client.close()
+    await run_in_threadpool(parse_pool.stop)
+    await async_engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -56,8 +90,8 @@ async def root():
 
 @app.get("/search", response_model=Dict[str, Union[List[Product], str, Dict]])
 async def search(
-    background_tasks: BackgroundTasks,
-    session: SessionDep,
+    response: Response,
+    session: AsyncSessionDep,
     query: Union[str, None] = None, 
     pages: int = 1, 
     min_price: Union[int, None] = None,
@@ -73,9 +107,12 @@ async def search(
     print(f"Max Pages: {pages}")
     print(f"Filters: {filters}")
 
-    configs = session.exec(select(ScraperConfig)).all()
-    enabled_scrapers = {cfg.name: cfg.enabled for cfg in configs}
+    config = config_store.get()
+    enabled_scrapers = dict(config.enabled_scrapers)
     print(f"Enabled Scrapers: {enabled_scrapers}")
+
+    # Track popular searches so they can be refreshed before they go stale
+    prewarmer.record(query, pages, min_price, max_price)
     
     storage = StorageManager(session)
 
@@ -85,17 +122,17 @@ async def search(
     cached_results = {}
     has_cached_results = False
 
-    # Try loading from DB first
+    # Try the in-memory cache, then the DB
     for scraper in ("flipkart", "amazon"):
         if not enabled_scrapers.get(scraper, False):
             continue
-        cached = storage.get_products(query, source=scraper, limit=25, min_price=min_price, max_price=max_price)
+        cached = await storage.get_search_results(query, scraper, min_price, max_price)
         if cached:
             cached_results[scraper] = cached
             has_cached_results = True
 
     should_scrape = True
-    cooldown = get_scrape_cooldown(session)
+    cooldown = config.cooldown
     now = datetime.now(timezone.utc)
 
     # Flatten all cached products from all sources
@@ -104,27 +141,37 @@ async def search(
         all_cached_products.extend(products)
 
     if all_cached_products:
-        latest_timestamp = max(
-            p.timestamp.replace(tzinfo=timezone.utc) if p.timestamp.tzinfo is None else p.timestamp
-            for p in all_cached_products
-        )
-
-        if now - latest_timestamp < cooldown:
+        if now - latest_timestamp(all_cached_products) < cooldown:
             should_scrape = False
             print("Using cached results, no need to scrape.")
 
     print(f"Should scrape: {should_scrape}")
 
+    scheduled = False
     if should_scrape:
-        # Always scrape in the background
-        background_tasks.add_task(
-            run_scrapers_and_update,
-            query=query,
-            pages=pages,
-            filters=filters,
-            enabled_scrapers=enabled_scrapers,
-            search_id=search_id  # Pass the search ID
-        )
+        # Share an in-flight scrape for the same search instead of starting another one
+        scrape_key = scrape_registry.make_key(query, pages, min_price, max_price)
+        job, created = scrape_registry.join(scrape_key, search_id)
+
+        if created:
+            # Scrape in the background, unless the scheduler is already at capacity
+            scheduled = scrape_scheduler.submit(
+                job,
+                INTERACTIVE,
+                query=query,
+                pages=pages,
+                filters=filters,
+                enabled_scrapers=enabled_scrapers,
+            )
+            if not scheduled:
+                scrape_registry.finish(job)
+                response.headers["Retry-After"] = str(SHED_RETRY_AFTER_SECONDS)
+                print(f"[WARN] Scrape queue is full, serving {query} without scraping")
+        else:
+            scheduled = True
+            # Pages scraped so far are replayed when the client's socket subscribes
+            await scrape_registry.catch_up(job, search_id)
+            print(f"Attached search {search_id} to in-flight scrape for: {query}")
 
     if has_cached_results:
         return {
@@ -132,6 +179,12 @@ async def search(
             "search_id": search_id,  # Include search_id in the response
             "status": "cached"
         }
+    elif should_scrape and not scheduled:
+        return {
+            "message": "Too many searches in progress, please try again shortly.",
+            "search_id": search_id,
+            "status": "pending"
+        }
     else:
         return {
             "message": "Loading… scraping in progress.",
@@ -139,85 +192,13 @@ async def search(
             "status": "pending"
         }
 
-async def run_scrapers_and_update(
-    query, 
-    pages, 
-    filters, 
-    enabled_scrapers, 
-    search_id
-):
-    """
-    Run scrapers in the background and update results via WebSockets.
-    """
-    results = {}
-    
-    # Create a new session for this background task since the original might be closed
-    from app.config.db import engine
-    with Session(engine) as session:
-        storage = StorageManager(session)
-        
-        if enabled_scrapers.get("flipkart", True):
-            flipkart_scraper = FlipkartScraper()
-            flipkart_results = await run_in_threadpool(flipkart_scraper.search, query, max_pages=pages, filters=filters)
-            flipkart_products = storage.save_products(flipkart_results)
-            results["flipkart"] = flipkart_products
-            
-            for product in flipkart_products:
-                session.refresh(product)
-
-            # Notify clients immediately after Flipkart results are available
-            await websocket_manager.broadcast_to_search(
-                search_id, 
-                {
-                    "type": "update",
-                    "source": "flipkart",
-                    "results": [p.model_dump(mode="json") for p in flipkart_products],
-                    "query": query
-                }
-            )
-
-        if enabled_scrapers.get("amazon", True):
-            amazon_api = AmazonAPIWrapper(os.environ.get("SCRAPEHERO_API"))
-            amazon_results = await run_in_threadpool(amazon_api.search, query, max_pages=pages, filters=filters)
-            amazon_products = storage.save_products(amazon_results)
-            results["amazon"] = amazon_products
-
-            for product in amazon_products:
-                session.refresh(product)
-            
-            # Notify clients immediately after Amazon results are available
-            await websocket_manager.broadcast_to_search(
-                search_id, 
-                {
-                    "type": "update",
-                    "source": "amazon",
-                    "results": [p.model_dump(mode="json") for p in amazon_products],
-                    "query": query
-                }
-            )
-
-        # Send final completion message
-        await websocket_manager.broadcast_to_search(
-            search_id, 
-            {
-                "type": "complete",
-                "query": query,
-                "sources": list(results.keys())
-            }
-        )
-
-    print(f"Scraping completed for query: {query}")
-
 @app.get("/r")
-def click(
+async def click(
     url: str,
     product_id: int,
-    session: SessionDep,
 ):
-    click = Click(product_id=int(product_id))
-    session.add(click)
-    session.commit()
-    session.refresh(click)
+    # Redirect right away, the click is written in the background
+    click_writer.put(Click(product_id=int(product_id)))
     print(f"Click registered for product ID: {product_id}")
 
     return RedirectResponse(url=unquote(url))
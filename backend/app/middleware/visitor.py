@@ -1,23 +1,24 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 from app.models.visitor import Visitor
-from app.config.db import get_session
+from app.services.visitor_log import visitor_writer
 
-class VisitorMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        allowed_paths = {"/", "/search", "/products"}
+class VisitorMiddleware:
+    """
+    Pure ASGI middleware that queues a `Visitor` record for tracked paths.
+    The records are written in bulk by `visitor_writer`.
+    """
+    allowed_paths = {"/", "/search", "/products"}
 
-        if request.url.path in allowed_paths:
-            ip = request.client.host
-            user_agent = request.headers.get("user-agent", "")
-            path = str(request.url.path)
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-            # Save visitor to DB
-            session_gen = get_session()
-            session = next(session_gen)
-            session.add(Visitor(ip=ip, user_agent=user_agent, path=path))
-            session.commit()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"] in self.allowed_paths:
+            client = scope.get("client")
+            ip = client[0] if client else ""
+            user_agent = Headers(scope=scope).get("user-agent", "")
 
-        response = await call_next(request)
+            visitor_writer.put(Visitor(ip=ip, user_agent=user_agent, path=scope["path"]))
 
-        return response
\ No newline at end of file
+        await self.app(scope, receive, send)
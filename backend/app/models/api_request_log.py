@@ -8,3 +8,6 @@ class ApiRequestLog(SQLModel, table=True):
     status_code: int
     method: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    latency_ms: Optional[float] = None
+    response_bytes: Optional[int] = None
+    query: Optional[str] = None
@@ -14,3 +14,12 @@ class Click(SQLModel, table=True):
 
     # Relationship: each click belongs to one product
     product: Optional["Product"] = Relationship(back_populates="clicks")
+
+
+class ProductClickCount(SQLModel, table=True):
+    """
+    Running number of clicks per product, maintained alongside `Click` inserts
+    so all-time counts can be read without counting rows.
+    """
+    product_id: int = Field(foreign_key="product.id", primary_key=True)
+    count: int = 0
@@ -4,4 +4,9 @@ from typing import Optional
 class ScraperConfig(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str  # e.g. "flipkart"
-    enabled: bool = True
\ No newline at end of file
+    enabled: bool = True
+
+    # Upstream rate limits, unset values fall back to the PROVIDER_* defaults
+    rate_per_sec: Optional[float] = None
+    burst: Optional[int] = None
+    max_retries: Optional[int] = None
@@ -1,20 +1,18 @@
-import requests
-import os
-from app.models.api_request_log import ApiRequestLog
-from app.config.db import engine
-from datetime import datetime
-from sqlmodel import Session
-from app.config.db import get_session
-from .base import BaseProvider
+import json
+from .base import BaseProvider, PageError
 from ..models.product import Product
+
 class AmazonAPIWrapper(BaseProvider):
+    name = "amazon"
     BASE_URL = "https://get.scrapehero.com/amz/keyword-search/"
 
     def __init__(self, api_key):
         self.api_key = api_key
 
-    def search(self, query, max_pages=1, filters=None):
-        results = []
+    async def iter_pages(self, query, max_pages=1, filters=None):
+        if not self.api_key:
+            print("[WARN] SCRAPEHERO_API is not set, skipping Amazon")
+            return
 
         for page in range(1, max_pages + 1):
             params = {
@@ -25,18 +23,14 @@ class AmazonAPIWrapper(BaseProvider):
             }
             
             try:
-                response = requests.get(self.BASE_URL, params=params)
-
-                with Session(engine) as session:
-                    log_entry = ApiRequestLog(endpoint="amazon_search", status_code=response.status_code, method=response.request.method, timestamp=datetime.utcnow(), query=query)
-                    session.add(log_entry)
-                    session.commit()
+                response = await self.fetch("amazon_search", self.BASE_URL, params=params, query=query)
 
                 if response.status_code != 200:
                     print(f"[ERROR] API failed on page {page}: {response.status_code}")
+                    yield page, PageError(page, f"status {response.status_code}")
                     continue
 
-                data = response.json()
+                data = json.loads(response.body)
                 raw_products = data.get("search_results", [])
 
                 products = self.parse_results(raw_products, query)
@@ -44,20 +38,21 @@ class AmazonAPIWrapper(BaseProvider):
                 if filters:
                     products = self.apply_filters(products, filters)
 
-                results.extend(products)
-
-                # Stop early if no next_page
-                if not data.get("next_page"):
-                    break
-
             except Exception as e:
                 print(f"[ERROR] Exception during API request: {e}")
-        
-        return results
+                yield page, PageError(page, e)
+                continue
+
+            yield page, products
+
+            # Stop early if no next_page
+            if not data.get("next_page"):
+                break
     
     def parse_results(self, raw_products, query):
         products = []
 
+        rows = []
         for item in raw_products:
             try:
                 name = item.get("name", "N/A")
@@ -65,22 +60,26 @@ class AmazonAPIWrapper(BaseProvider):
                 url = item.get("product_url", "N/A")
                 rating = round(float(item.get("rating") or 0.0), 1)
                 review_count = int(item.get("review_count", "0"))
-                
-                price = self.parse_price(f"${raw_price}")
-
-                product = Product(
-                    name=name,
-                    price=price,
-                    url=url,
-                    rating=rating,
-                    review_count=review_count,
-                    query=query,
-                    source="amazon"
-                )
-
-                products.append(product)
+
+                rows.append((name, f"${raw_price}", url, rating, review_count))
             except Exception as e:
-                print(product)
+                print(item)
                 print(f"[ERROR] Failed to parse product: {e}")
+
+        # Convert every price on the page in one go
+        prices = self.parse_prices([row[1] for row in rows])
+
+        for (name, _, url, rating, review_count), price in zip(rows, prices):
+            product = Product(
+                name=name,
+                price=price,
+                url=url,
+                rating=rating,
+                review_count=review_count,
+                query=query,
+                source="amazon"
+            )
+
+            products.append(product)
         
-        return products
\ No newline at end of file
+        return products
@@ -1,12 +1,101 @@
 from abc import ABC, abstractmethod
+import aiohttp
+import asyncio
 import re
-from currency_converter import CurrencyConverter
+import time
+from ..services.fx import fx_rates
+from ..services.http import http_client
+from ..services.rate_limit import RETRY_STATUSES, THROTTLE_STATUSES, parse_retry_after, rate_limiters
+from ..services.request_log import record_request
+
+class PageError(Exception):
+    """
+    A provider page that could not be fetched or parsed.
+    """
+    def __init__(self, page, error):
+        super().__init__(f"page {page}: {error}")
+        self.page = page
+        self.error = error
+
 
 class BaseProvider(ABC):
+    # Name used for per-provider rate limits, matches ScraperConfig.name
+    name = "default"
+
     @abstractmethod
-    def search(self, query, max_pages=1, filters=None):
+    def iter_pages(self, query, max_pages=1, filters=None):
+        """
+        Async generator yielding `(page, products)` as soon as each page is parsed.
+        A page that fails yields `(page, PageError)` instead, so callers can
+        tell it apart from a page without products.
+        """
         pass
 
+    async def search(self, query, max_pages=1, filters=None):
+        results = []
+        async for _, products in self.iter_pages(query, max_pages=max_pages, filters=filters):
+            if not isinstance(products, PageError):
+                results.extend(products)
+        return results
+
+    async def fetch(self, endpoint, url, params=None, headers=None, query=None):
+        """
+        GET an upstream URL through the shared HTTP client and record the call
+        under `endpoint` in the API request log. Network errors are recorded
+        with status code 0.
+
+        Requests go through the provider's rate limiter. Throttling responses,
+        5xx responses and network errors are retried with jittered backoff
+        while the provider's retry budget allows; after that the last response
+        is returned, or the network error re-raised.
+        """
+        limiter = rate_limiters.get(self.name)
+        attempt = 0
+
+        while True:
+            await limiter.acquire()
+            limiter.record_attempt(retry=attempt > 0)
+
+            start = time.perf_counter()
+            try:
+                response = await http_client.get(url, params=params, headers=headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                record_request(endpoint, 0, "GET", latency_ms=(time.perf_counter() - start) * 1000, query=query)
+                attempt += 1
+                if not limiter.allow_retry(attempt):
+                    raise
+                print(f"[WARN] {self.name}: {e}, retry {attempt}/{limiter.max_retries}")
+                await asyncio.sleep(limiter.backoff(attempt))
+                continue
+            except Exception:
+                record_request(endpoint, 0, "GET", latency_ms=(time.perf_counter() - start) * 1000, query=query)
+                raise
+
+            record_request(
+                endpoint,
+                response.status_code,
+                response.method,
+                latency_ms=response.elapsed_ms,
+                response_bytes=len(response.body),
+                query=query,
+            )
+
+            retry_after = None
+            if response.status_code in THROTTLE_STATUSES:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                limiter.on_throttle(retry_after)
+            elif response.status_code < 500:
+                limiter.on_success()
+
+            if response.status_code not in RETRY_STATUSES:
+                return response
+
+            attempt += 1
+            if not limiter.allow_retry(attempt):
+                return response
+            print(f"[WARN] {self.name}: status {response.status_code}, retry {attempt}/{limiter.max_retries}")
+            await asyncio.sleep(limiter.backoff(attempt, retry_after))
+
     def apply_filters(self, products, filters):
         results = []
 
@@ -29,24 +118,38 @@ class BaseProvider(ABC):
         return results
     
     def parse_price(self, p):
-        converter = CurrencyConverter()
+        return self.parse_prices([p])[0]
 
-        try:
-            currency = self._detect_currency(p)
+    def parse_prices(self, raw_prices):
+        """
+        Parse a page worth of price strings and convert them to USD,
+        doing a single rate lookup per currency.
+        """
+        prices = [None] * len(raw_prices)
+        by_currency = {}
 
-            # Extract only numbers and optional decimal part
-            numeric = re.sub(r"[^\d.]", "", p)
-            amount = float(numeric)
+        for i, p in enumerate(raw_prices):
+            if p is None:
+                continue
+            try:
+                currency = self._detect_currency(p)
+                if currency is None:
+                    raise ValueError("unknown currency")
+
+                # Extract only numbers and optional decimal part
+                numeric = re.sub(r"[^\d.]", "", p)
+                by_currency.setdefault(currency, []).append((i, float(numeric)))
+            except:
+                print("[Error] Failed to parse price:", p)
 
+        for currency, entries in by_currency.items():
             # Convert to USD if needed
-            if currency != "USD":
-                amount = converter.convert(amount, currency, "USD")
+            amounts = fx_rates.convert_many([amount for _, amount in entries], currency, "USD")
+            for (i, _), amount in zip(entries, amounts):
+                prices[i] = round(amount, 2)
+
+        return prices
 
-            return round(amount, 2)
-        except:
-            print("[Error] Failed to parse price:", p)
-            return None
-    
     def _detect_currency(self, p):
         # Detect currency
         if "₹" in p:
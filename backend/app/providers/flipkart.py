@@ -1,13 +1,13 @@
-import requests
+import asyncio
 import re
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qsl, urlunparse, urlencode
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from .base import BaseScraper
+from .base import BaseScraper, PageError
+from .parsing import HTMLParsingEngine
 from ..models.product import Product
-from ..services.storage import StorageManager
+from ..services.parse_pool import parse_pool
 
 class FlipkartScraper(BaseScraper):
+    name = "flipkart"
     BASE_URL = "https://www.flipkart.com/search?"
     
     SELECTORS = {
@@ -35,36 +35,56 @@ class FlipkartScraper(BaseScraper):
         "link_class": "rPDeLR"
     }
 
+    _engine = None
+
     def __init__(self):
         super().__init__(self.BASE_URL)
-    
-    def search(self, query, max_pages=5, filters=None):
-        results = []
-
-        def scrape_page(page):
-            html = self.get_html(query, page)
-            if not html:
-                return []
-            products = self.parse_html(html, query)
-            return self.apply_filters(products, filters) if filters else products
 
+    @classmethod
+    def parsing_engine(cls):
+        """
+        Shared parsing engine with every layout's selectors compiled once.
+        """
+        if cls._engine is None:
+            cls._engine = HTMLParsingEngine([
+                ("default", cls.SELECTORS),
+                ("alternative", cls.ALTERNATIVE_SELECTORS),
+                ("third", cls.THIRD_SELECTORS),
+            ])
+        return cls._engine
+    
+    async def iter_pages(self, query, max_pages=5, filters=None):
+        async def scrape_page(page):
+            try:
+                html = await self.get_html(query, page)
+                if not html:
+                    raise ValueError("no HTML returned")
+                # Parsing is CPU bound, run it in the parse pool and only build models here
+                records = await parse_pool.run(parse_records, html)
+                products = self.build_products(records, query)
+            except Exception as e:
+                raise PageError(page, e) from e
+            return page, self.apply_filters(products, filters) if filters else products
 
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [executor.submit(scrape_page, page) for page in range(1, max_pages + 1)]
-
-            for future in as_completed(futures):
+        # Fetch every page concurrently and hand them out in completion order
+        tasks = [asyncio.ensure_future(scrape_page(page)) for page in range(1, max_pages + 1)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
                 try:
-                    page_results = future.result()
-                    results.extend(page_results)
-                except Exception as e:
-                    print(f"[ERROR] Exception while scraping: {e}")
-
-        return results
-
-    def get_html(self, query, page=1):
+                    page, products = await next_done
+                except PageError as e:
+                    print(f"[ERROR] Exception while scraping {e}")
+                    yield e.page, e
+                    continue
+                yield page, products
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_html(self, query, page=1):
         params = {"q": query, "page": page}
         url = f"{self.BASE_URL}{urlencode(params)}"
-        response = requests.get(url, headers=self.headers)
+        response = await self.fetch("flipkart_search", url, headers=self.headers, query=query)
         return response.text if response.status_code == 200 else None
 
     def _clean_url(self, url):
@@ -78,66 +98,59 @@ class FlipkartScraper(BaseScraper):
         return cleaned_url
 
     def parse_html(self, html, query):
-        soup = BeautifulSoup(html, "html.parser")
-        products = []
-        
-        containers = (
-            soup.select(self.SELECTORS["product"]) or
-            soup.select(self.ALTERNATIVE_SELECTORS["product"]) or
-            soup.select(self.THIRD_SELECTORS["product"])
-        )
+        return self.build_products(self.parse_records(html), query)
 
+    def parse_records(self, html):
+        """
+        Extract compact `(name, raw_price, url, rating, ratings_count)` records
+        from a search results page. Prices are left as text so they can be
+        converted in one batch by `build_products`.
+        """
+        layout, containers = self.parsing_engine().parse(html)
 
         if not containers:
             print("[WARN] No products found on this page.")
 
+        records = []
         for container in containers:
             try:
-                name_elem, price_elem, link_elem, rating_elem, ratings_count_elem = self._select_elements(container)
+                name_elem, price_elem, link_elem, rating_elem, ratings_count_elem = layout.select_elements(container)
 
                 name = self._extract_name(name_elem)
-                price = self.parse_price(price_elem.get_text(strip=True)) if price_elem else None
+                raw_price = price_elem.get_text(strip=True) if price_elem else None
                 raw_url = f"https://www.flipkart.com{link_elem['href']}" if link_elem else None
                 url = self._clean_url(raw_url)
                 rating = self._aggregate_rating(float(rating_elem.get_text(strip=True))) if rating_elem else 0.0
                 ratings_count = self._extract_ratings_count(ratings_count_elem)
 
-                product = Product(
-                    name=name,
-                    price=price,
-                    url=url,
-                    rating=rating,
-                    review_count=ratings_count,
-                    query=query,
-                    source="flipkart"
-                )
-
-                products.append(product)
+                records.append((name, raw_price, url, rating, ratings_count))
 
             except Exception as e:
                 print(f"[ERROR] Failed to process product: {e} of {container.name}")
                 continue
-        
-        return products
-    
-    def _select_elements(self, container):
-        container_classes = container.get("class", [])
-
-        for selector_set in [self.SELECTORS, self.ALTERNATIVE_SELECTORS, self.THIRD_SELECTORS]:
-            if selector_set["product"].strip(".") not in container_classes:
-                # print(f"[INFO] Skipping container with class {container_classes} for selector {selector_set['product']}")
-                continue
-            
-            name_elem = container.select_one(selector_set["name"])
-            price_elem = container.select_one(selector_set["price"])
-            rating_elem = container.select_one(selector_set["rating"]) if "rating" in selector_set else None
-            ratings_count_elem = container.select_one(selector_set["ratings_count"]) if "ratings_count" in selector_set else None
-            link_elem = container.select_one(f'a.{selector_set["link_class"]}[href]')
 
-            return name_elem, price_elem, link_elem, rating_elem, ratings_count_elem
+        return records
 
-        return None, None, None, None, None
+    def build_products(self, records, query):
+        products = []
 
+        # Convert every price on the page in one go
+        prices = self.parse_prices([record[1] for record in records])
+
+        for (name, _, url, rating, ratings_count), price in zip(records, prices):
+            product = Product(
+                name=name,
+                price=price,
+                url=url,
+                rating=rating,
+                review_count=ratings_count,
+                query=query,
+                source="flipkart"
+            )
+
+            products.append(product)
+        
+        return products
     
     def _extract_ratings_count(self, ratings_count_elem):
         if not ratings_count_elem:
@@ -165,13 +178,23 @@ class FlipkartScraper(BaseScraper):
     def _extract_name(self, elem):
         return elem.get("title") or elem.get_text(strip=True) if elem else "N/A"
 
+def parse_records(html):
+    """
+    Module-level entry point for parsing a page in the parse pool.
+    """
+    return FlipkartScraper().parse_records(html)
+
 # TODO: Used for testing purposes! Remove later
 if __name__ == "__main__":
-    scraper = FlipkartScraper()
-    query = "phone"
-    results = scraper.search(query, max_pages=2, filters={"min_price": 50})
+    from ..services.http import http_client
+
+    async def main():
+        scraper = FlipkartScraper()
+        query = "phone"
+        results = await scraper.search(query, max_pages=2, filters={"min_price": 50})
+        await http_client.close()
 
-    storage = StorageManager()
+        for product in results:
+            print(product)
 
-    # Save both results
-    storage.save_products(results, query)
+    asyncio.run(main())
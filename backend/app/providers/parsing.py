@@ -0,0 +1,186 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import re
+import soupsieve
+import threading
+
+try:
+    import lxml.html
+    from lxml import etree
+    from cssselect import HTMLTranslator
+except ImportError:  # pragma: no cover - optional speedup
+    lxml = None
+
+# Parser backend used for product pages:
+#   "lxml"        - native lxml tree with selectors compiled to XPath (fastest)
+#   "bs4-lxml"    - BeautifulSoup tree built by lxml
+#   "html.parser" - BeautifulSoup tree built by the pure-Python parser
+HTML_PARSER_BACKEND = os.environ.get("HTML_PARSER_BACKEND", "lxml")
+
+
+class SoupBackend:
+    """
+    BeautifulSoup trees with soupsieve selectors. Only the product containers
+    are kept while the document is tokenized.
+    """
+    def __init__(self, builder: str, container_classes: Sequence[str]):
+        self.name = "bs4-lxml" if builder == "lxml" else builder
+        self.builder = builder
+        classes = "|".join(re.escape(c) for c in container_classes)
+        self._strainer = SoupStrainer(class_=re.compile(rf"(?:^|\s)(?:{classes})(?:\s|$)"))
+
+    def parse(self, html: str):
+        return BeautifulSoup(html, self.builder, parse_only=self._strainer)
+
+    def compile(self, selector: str):
+        return soupsieve.compile(selector)
+
+    def select(self, compiled, node) -> List:
+        return compiled.select(node)
+
+    def select_one(self, compiled, node):
+        # Match the node itself too, some layouts use the product link as container
+        return node if compiled.match(node) else compiled.select_one(node)
+
+
+class LxmlNode:
+    """
+    Minimal BeautifulSoup-like view of an lxml element, covering what the
+    providers use to extract product fields.
+    """
+    __slots__ = ("element",)
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def name(self) -> str:
+        return self.element.tag
+
+    def get(self, key, default=None):
+        return self.element.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.element.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        texts = self.element.itertext()
+        if strip:
+            texts = [t.strip() for t in texts if t.strip()]
+        return separator.join(texts)
+
+
+class LxmlBackend:
+    """
+    Native lxml trees with CSS selectors translated to compiled XPath.
+    """
+    name = "lxml"
+
+    def __init__(self):
+        self._translator = HTMLTranslator()
+        self._local = threading.local()
+
+    def _parser(self):
+        # lxml parsers must not be shared between threads
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = lxml.html.HTMLParser(encoding="utf-8")
+        return parser
+
+    def parse(self, html: str):
+        try:
+            return LxmlNode(lxml.html.fromstring(html.encode("utf-8"), parser=self._parser()))
+        except etree.ParserError:
+            return None
+
+    def compile(self, selector: str):
+        # descendant-or-self also matches the node itself, like SoupBackend.select_one
+        return etree.XPath(self._translator.css_to_xpath(selector))
+
+    def select(self, compiled, node) -> List:
+        return [LxmlNode(e) for e in compiled(node.element)] if node is not None else []
+
+    def select_one(self, compiled, node):
+        found = compiled(node.element)
+        return LxmlNode(found[0]) if found else None
+
+
+def create_backend(name: str, container_classes: Sequence[str]):
+    """
+    Create the requested backend, falling back to html.parser when its
+    dependencies are not installed.
+    """
+    if name == "lxml" and lxml is not None:
+        return LxmlBackend()
+    if name == "bs4-lxml" and builder_registry.lookup("lxml") is not None:
+        return SoupBackend("lxml", container_classes)
+    if name != "html.parser":
+        print(f"[WARN] HTML parser backend '{name}' is not available, using html.parser")
+    return SoupBackend("html.parser", container_classes)
+
+
+class Layout:
+    """
+    One page layout with its CSS selectors compiled once for a backend.
+    """
+    def __init__(self, name: str, selectors: Dict[str, str], backend):
+        self.name = name
+        self.backend = backend
+        self.container_class = container_class(selectors)
+
+        self.container = backend.compile(selectors["product"])
+        self.title = backend.compile(selectors["name"])
+        self.price = backend.compile(selectors["price"])
+        self.link = backend.compile(f'a.{selectors["link_class"]}[href]')
+        self.rating = backend.compile(selectors["rating"]) if "rating" in selectors else None
+        self.ratings_count = backend.compile(selectors["ratings_count"]) if "ratings_count" in selectors else None
+
+    def containers(self, root) -> List:
+        return self.backend.select(self.container, root)
+
+    def select_elements(self, container):
+        select_one = self.backend.select_one
+        return (
+            select_one(self.title, container),
+            select_one(self.price, container),
+            select_one(self.link, container),
+            select_one(self.rating, container) if self.rating else None,
+            select_one(self.ratings_count, container) if self.ratings_count else None,
+        )
+
+
+def container_class(selectors: Dict[str, str]) -> str:
+    return selectors["product"].rsplit(".", 1)[-1]
+
+
+class HTMLParsingEngine:
+    """
+    Parses product containers out of a search results page.
+
+    Selectors for every layout are compiled once. The first layout (in
+    priority order) that has containers on the page is detected and only its
+    selectors are applied to the products on it.
+    """
+    def __init__(self, selector_sets: Sequence[Tuple[str, Dict[str, str]]], backend: str = HTML_PARSER_BACKEND):
+        self.backend = create_backend(backend, [container_class(s) for _, s in selector_sets])
+        self.layouts = [Layout(name, selectors, self.backend) for name, selectors in selector_sets]
+
+    def parse(self, html: str) -> Tuple[Optional[Layout], List]:
+        """
+        Return the detected layout and its product containers.
+        """
+        root = self.backend.parse(html)
+        if root is None:
+            return None, []
+
+        for layout in self.layouts:
+            containers = layout.containers(root)
+            if containers:
+                return layout, containers
+
+        return None, []
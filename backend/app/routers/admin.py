@@ -1,9 +1,22 @@
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, select
 from app.models.scraper_config import ScraperConfig
-from app.models.setting import Setting
 from app.config.db import get_session
-from typing import Annotated
+from app.services.fx import fx_rates
+from app.services.settings import config_store
+from app.services.visitor_log import visitor_writer
+from app.services.click_log import click_writer
+from app.services.request_log import request_log_writer
+from app.services.scrape_jobs import scrape_registry
+from app.services.result_cache import result_cache
+from app.services.pipeline import provider_stats
+from app.services.parse_pool import parse_pool
+from app.services.scheduler import scrape_scheduler
+from app.services.rate_limit import rate_limiters
+from app.services.prewarm import prewarmer
+from app.services.db_maintenance import sqlite_maintenance
+from app.services.websocket import manager as websocket_manager
+from typing import Annotated, Optional
 
 SessionDep = Annotated[Session, Depends(get_session)]
 
@@ -11,20 +24,14 @@ router = APIRouter()
 
 @router.post("/scrapers/{scraper_name}/enable")
 def enable_scraper(scraper_name: str, session: SessionDep):
-    config = session.exec(select(ScraperConfig).where(ScraperConfig.name == scraper_name)).first()
-    if config:
-        config.enabled = True
-        session.commit()
+    if config_store.set_scraper_enabled(session, scraper_name, True):
         return {"status": "enabled"}
     else:
         return {"status": "not found"}
 
 @router.post("/scrapers/{scraper_name}/disable")
 def disable_scraper(scraper_name: str, session: SessionDep):
-    config = session.exec(select(ScraperConfig).where(ScraperConfig.name == scraper_name)).first()
-    if config:
-        config.enabled = False
-        session.commit()
+    if config_store.set_scraper_enabled(session, scraper_name, False):
         return {"status": "disabled"}
     else:
         return {"status": "not found"}
@@ -42,21 +49,55 @@ def get_scraper_config(scraper_name: str, session: SessionDep):
     else:
         return {"status": "not found"}
     
+@router.post("/scrapers/{scraper_name}/limits")
+def set_scraper_limits(
+    scraper_name: str,
+    session: SessionDep,
+    rate_per_sec: Optional[float] = None,
+    burst: Optional[int] = None,
+    max_retries: Optional[int] = None,
+):
+    if config_store.set_scraper_limits(session, scraper_name, rate_per_sec, burst, max_retries):
+        return {"status": "updated", "limits": config_store.get().scraper_limits[scraper_name]}
+    else:
+        return {"status": "not found"}
+
 @router.post("/cooldown")
 def set_cooldown(minutes: int, session: Session = Depends(get_session)):
-    setting = session.exec(select(Setting).where(Setting.key == "scrape_cooldown_minutes")).first()
-    if setting:
-        setting.value = str(minutes)
-    else:
-        setting = Setting(key="scrape_cooldown_minutes", value=str(minutes))
-        session.add(setting)
-    session.commit()
+    config_store.set_cooldown(session, minutes)
     return {"message": f"Cooldown updated to {minutes} minutes"}
 
 @router.get("/cooldown")
-def get_cooldown(session: Session = Depends(get_session)):
-    setting = session.exec(select(Setting).where(Setting.key == "scrape_cooldown_minutes")).first()
-    if setting:
-        return {"cooldown": int(setting.value)}
-    else:
-        return {"cooldown": 10}
\ No newline at end of file
+def get_cooldown():
+    return {"cooldown": config_store.get().cooldown_minutes}
+
+@router.get("/config")
+def get_config():
+    config = config_store.get()
+    return {
+        "enabled_scrapers": dict(config.enabled_scrapers),
+        "cooldown": config.cooldown_minutes,
+        "version": config.version,
+    }
+
+@router.get("/metrics")
+def get_metrics():
+    return {
+        "fx": fx_rates.stats(),
+        "visitor_writer": visitor_writer.stats(),
+        "click_writer": click_writer.stats(),
+        "request_log_writer": request_log_writer.stats(),
+        "scrapes": scrape_registry.stats(),
+        "result_cache": result_cache.stats(),
+        "providers": provider_stats(),
+        "parse_pool": parse_pool.stats(),
+        "scheduler": scrape_scheduler.stats(),
+        "rate_limits": rate_limiters.stats(),
+        "prewarm": prewarmer.stats(),
+        "sqlite": sqlite_maintenance.stats(),
+        "websockets": websocket_manager.stats(),
+    }
+
+@router.get("/scheduler")
+def get_scheduler():
+    return scrape_scheduler.stats()
@@ -1,19 +1,20 @@
 from fastapi import APIRouter, Query, Depends
 from typing import Union
-from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import func, select
 from datetime import datetime
 from app.models.api_request_log import ApiRequestLog
-from app.config.db import get_session
+from app.config.db import get_async_session
 from typing import Annotated
 
-SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 router = APIRouter()
 
 @router.get("/{endpoint_name}/count")
 async def api_request_count(
     endpoint_name: str,
-    session: SessionDep,
+    session: AsyncSessionDep,
     start_date: Union[datetime, None] = Query(default=None, description="Start date for filtering"),
     end_date: Union[datetime, None] = Query(default=None, description="End date for filtering"),
     status_code: Union[int, None] = Query(default=None, description="HTTP status code for filtering"),
@@ -31,14 +32,14 @@ async def api_request_count(
     if method:
         stmt = stmt.where(ApiRequestLog.method == method.upper())
 
-    count = session.exec(stmt).one()
+    count = (await session.exec(stmt)).one()
 
     return {"count": count}
 
 @router.get("/{endpoint_name}/log")
 async def api_request_log(
     endpoint_name: str,
-    session: SessionDep,
+    session: AsyncSessionDep,
     start_date: Union[datetime, None] = Query(default=None, description="Start date for filtering"),
     end_date: Union[datetime, None] = Query(default=None, description="End date for filtering"),
     status_code: Union[int, None] = Query(default=None, description="HTTP status code for filtering"),
@@ -59,6 +60,6 @@ async def api_request_log(
 
     stmt = stmt.limit(limit)
 
-    logs = session.exec(stmt).all()  # Execute the query
+    logs = (await session.exec(stmt)).all()  # Execute the query
 
     return {"api-request-log": logs}
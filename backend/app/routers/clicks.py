@@ -1,19 +1,27 @@
 from fastapi import APIRouter, Query, Depends
 from typing import Union
 from datetime import datetime
-from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, func
 from app.models.click import Click
 from app.models.product import Product
-from app.config.db import get_session
+from app.config.db import get_async_session
 from typing import Annotated
 
-SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 router = APIRouter()
 
+def _in_range(stmt, start_date: Union[datetime, None], end_date: Union[datetime, None]):
+    if start_date:
+        stmt = stmt.where(Click.timestamp >= start_date)
+    if end_date:
+        stmt = stmt.where(Click.timestamp <= end_date)
+    return stmt
+
 @router.get("/products/noc")
 async def get_total_clicks(
-    session: SessionDep,
+    session: AsyncSessionDep,
     start_date: Union[datetime, None] = Query(default=None, description="Start date for filtering"),
     end_date: Union[datetime, None] = Query(default=None, description="End date for filtering")
 ):
@@ -32,39 +40,29 @@ async def get_total_clicks(
         .where(Product.source == "amazon")
     )
 
-    if start_date:
-        stmt = stmt.where(Click.timestamp >= start_date)
-    if end_date:
-        stmt = stmt.where(Click.timestamp <= end_date)
-
-    total = session.exec(stmt_total).one()
-    flipkart = session.exec(stmt_flipkart).one()
-    amazon = session.exec(stmt_amazon).one()
+    total = (await session.exec(_in_range(stmt_total, start_date, end_date))).one()
+    flipkart = (await session.exec(_in_range(stmt_flipkart, start_date, end_date))).one()
+    amazon = (await session.exec(_in_range(stmt_amazon, start_date, end_date))).one()
 
     return {"number_of_clicks": {"total": total, "flipkart": flipkart, "amazon": amazon}}
 
 
 @router.get("/products/noc/total")
 async def get_total_clicks(
-    session: SessionDep,
+    session: AsyncSessionDep,
     start_date: Union[datetime, None] = Query(default=None, description="Start date for filtering"),
     end_date: Union[datetime, None] = Query(default=None, description="End date for filtering")
 ):
     statement = select(func.count()).select_from(Click)
 
-    if start_date:
-        stmt = stmt.where(Click.timestamp >= start_date)
-    if end_date:
-        stmt = stmt.where(Click.timestamp <= end_date)
-
-    total = session.exec(statement).one()
+    total = (await session.exec(_in_range(statement, start_date, end_date))).one()
 
     return {"number_of_clicks": total}
 
 @router.get("/products/noc/{source}")
 async def get_total_clicks(
     source: str,
-    session: SessionDep,
+    session: AsyncSessionDep,
     start_date: Union[datetime, None] = Query(default=None, description="Start date for filtering"),
     end_date: Union[datetime, None] = Query(default=None, description="End date for filtering")
 ):
@@ -75,11 +73,6 @@ async def get_total_clicks(
         .where(Product.source == source)
     )
 
-    if start_date:
-        stmt = stmt.where(Click.timestamp >= start_date)
-    if end_date:
-        stmt = stmt.where(Click.timestamp <= end_date)
-
-    total = session.exec(statement).one()
+    total = (await session.exec(_in_range(statement, start_date, end_date))).one()
 
     return {"number_of_clicks": total}
\ No newline at end of file
@@ -1,24 +1,25 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from typing import Union, Optional, List
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.product import ProductWithNOC
 from app.models.date_range import TimeFrame
-from app.config.db import get_session
+from app.config.db import get_async_session
 from app.services.storage import StorageManager
 from typing import Annotated
 
-SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 router = APIRouter()
 
 @router.get("/", response_model=dict[str, List[ProductWithNOC]])
-def get_products(
-    session: SessionDep,
+async def get_products(
+    session: AsyncSessionDep,
     query: Union[str, None] = None, 
     min_price: Union[int, None] = None,
     max_price: Union[int, None] = None,
     limit: int = 20,
-    time_frame: Optional[TimeFrame] = None
+    time_frame: Optional[TimeFrame] = None,
+    use_counter: bool = Query(default=False, description="Read all-time click counts from the maintained counter (ignored with time_frame)")
 ):
 
     print(f"Query: {query}")
@@ -34,7 +35,7 @@ def get_products(
         start_date = None
         end_date = None
     
-    results = storage.get_products_with_noc(query=query, min_price=min_price, max_price=max_price, start_date=start_date, end_date=end_date, limit=limit)
+    results = await storage.get_products_with_noc(query=query, min_price=min_price, max_price=max_price, start_date=start_date, end_date=end_date, limit=limit, use_counter=use_counter)
 
     return {
         "results": results
@@ -1,23 +1,24 @@
 from fastapi import APIRouter, Depends
 from typing import Optional
-from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import func, select
 from app.models.date_range import TimeFrame
 from app.models.visitor import Visitor
-from app.config.db import get_session
+from app.config.db import get_async_session
 from typing import Annotated
 
-SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 router = APIRouter()
 
 @router.get("/count")
-async def visitor_count(session: SessionDep):
-    count = session.exec(select(func.count()).select_from(Visitor)).one()
+async def visitor_count(session: AsyncSessionDep):
+    count = (await session.exec(select(func.count()).select_from(Visitor))).one()
     return {"total_visitors": count}
 
 @router.get("/log")
 async def visitor_log(
-    session: SessionDep,
+    session: AsyncSessionDep,
     limit: int = 50,
     time_frame: Optional[TimeFrame] = None
 ):
@@ -28,5 +29,5 @@ async def visitor_log(
         end_date = data_range.end_date
         statement = statement.where(Visitor.timestamp >= start_date).where(Visitor.timestamp <= end_date)
 
-    visitors = session.exec(statement).all()
+    visitors = (await session.exec(statement)).all()
     return {"visitors": visitors}
\ No newline at end of file
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends
+from starlette.websockets import WebSocketState
 from typing import Optional
 from app.services.websocket import manager
 import uuid
@@ -20,26 +21,25 @@ async def websocket_endpoint(
     if not search_id:
         search_id = str(uuid.uuid4())
     
-    # Accept the connection and register it
+    # Accept the connection and register it. The manager sends the connection
+    # confirmation and replays updates broadcast before the client subscribed.
     connection_id = await manager.connect(websocket, search_id)
-    
-    # Send initial connection confirmation with search_id
-    await websocket.send_json({
-        "type": "connection_established",
-        "connection_id": connection_id,
-        "search_id": search_id
-    })
-    
+
     try:
-        # Keep the connection alive
-        while True:
+        # Keep the connection alive until the client leaves or the manager evicts it
+        while websocket.application_state == WebSocketState.CONNECTED:
             # Wait for any messages from the client (can be used for pings/keepalive)
             data = await websocket.receive_text()
-            # Echo back as a simple acknowledgment
-            await websocket.send_json({
+            # Echo back as a simple acknowledgment, through the queue so sends never interleave
+            await manager.send_to_connection(connection_id, {
                 "type": "ack",
                 "message": f"Message received: {data}"
             })
     except WebSocketDisconnect:
-        # Remove the connection when the client disconnects
+        pass
+    except RuntimeError:
+        # The manager closed the socket (eviction) while we were receiving
+        pass
+    finally:
+        # Remove the connection when the client disconnects or it was evicted
         manager.disconnect(connection_id)
\ No newline at end of file
@@ -0,0 +1,217 @@
+from collections import deque
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Callable, List, Optional, Tuple, Type
+import asyncio
+import time
+
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+
+# Outcomes of one write attempt of (part of) a batch
+WRITTEN = "written"
+RETRY_LATER = "retry_later"
+SPLIT = "split"
+FAILED = "failed"
+
+
+class BatchWriter:
+    """
+    Write-behind buffer that persists records in bulk from a background task.
+
+    Records are queued in memory by `put` and flushed every `max_batch` records
+    or every `flush_interval_ms`, whichever comes first. A bounded queue drops
+    records according to `drop_policy`; pass `max_queue=None` for an unbounded
+    queue when records must never be dropped. Batches failing with one of the
+    `retry_on` exceptions are retried with backoff and, if they still fail, put
+    back at the head of the queue for the next flush. Batches failing with one
+    of the `split_on` exceptions (e.g. a constraint violated by a single row)
+    are split in halves until the offending records are isolated, so only
+    those are counted as failed.
+    """
+    def __init__(
+        self,
+        name: str,
+        persist: Callable[[List[Any]], None],
+        max_batch: int = 100,
+        flush_interval_ms: int = 500,
+        max_queue: Optional[int] = 10000,
+        drop_policy: str = DROP_NEWEST,
+        retries: int = 0,
+        retry_on: Tuple[Type[BaseException], ...] = (),
+        retry_backoff_ms: int = 50,
+        split_on: Tuple[Type[BaseException], ...] = (),
+    ):
+        if drop_policy not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+
+        self.name = name
+        self.persist = persist
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.drop_policy = drop_policy
+        self.retries = retries
+        self.retry_on = retry_on
+        self.retry_backoff = retry_backoff_ms / 1000
+        self.split_on = split_on
+
+        self._queue: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self._enqueued = 0
+        self._dropped = 0
+        self._written = 0
+        self._failed = 0
+        self._batches = 0
+        self._retries = 0
+        self._splits = 0
+        self._max_depth = 0
+        self._in_flight = 0
+        self._last_flush_ms = 0.0
+
+    def put(self, record: Any) -> bool:
+        """
+        Queue a record for writing. Returns False if the record was dropped.
+        """
+        if self.max_queue is not None and len(self._queue) >= self.max_queue:
+            self._dropped += 1
+            if self.drop_policy == DROP_NEWEST:
+                return False
+            self._queue.popleft()
+
+        self._queue.append(record)
+        self._enqueued += 1
+        self._max_depth = max(self._max_depth, len(self._queue))
+
+        if len(self._queue) >= self.max_batch:
+            self._wake()
+        return True
+
+    def _wake(self) -> None:
+        if self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the background task and write out everything still queued.
+        """
+        if self._task is not None:
+            # Let an in-flight flush finish rather than cancelling it mid-write
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+        if self._queue:
+            print(f"[ERROR] {self.name}: {len(self._queue)} records could not be written on shutdown")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[ERROR] {self.name}: flush failed: {e}")
+
+    async def flush(self) -> None:
+        """
+        Write out the queue in batches of at most `max_batch` records.
+        """
+        async with self._flush_lock:
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+                self._in_flight = len(batch)
+                try:
+                    written = await run_in_threadpool(self._write, batch)
+                finally:
+                    self._in_flight = 0
+                if not written:
+                    break
+
+    def _write(self, batch: List[Any]) -> bool:
+        start = time.perf_counter()
+        parts = [batch]
+        while parts:
+            part = parts.pop(0)
+            outcome = self._attempt(part)
+            if outcome == RETRY_LATER:
+                # Keep this part and everything not written yet for the next flush
+                remaining = part + [record for rest in parts for record in rest]
+                self._queue.extendleft(reversed(remaining))
+                return False
+            if outcome == SPLIT:
+                middle = len(part) // 2
+                parts[:0] = [part[:middle], part[middle:]]
+
+        self._batches += 1
+        self._last_flush_ms = (time.perf_counter() - start) * 1000
+        return True
+
+    def _attempt(self, part: List[Any]) -> str:
+        for attempt in range(self.retries + 1):
+            try:
+                self.persist(part)
+                self._written += len(part)
+                return WRITTEN
+            except self.retry_on as e:
+                if attempt == self.retries:
+                    print(f"[WARN] {self.name}: giving up on batch of {len(part)} for now: {e}")
+                    return RETRY_LATER
+                self._retries += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+            except self.split_on as e:
+                if len(part) > 1:
+                    self._splits += 1
+                    return SPLIT
+                print(f"[ERROR] {self.name}: rejected record {part[0]!r}: {e}")
+                self._failed += 1
+                return FAILED
+            except Exception as e:
+                print(f"[ERROR] {self.name}: failed to write batch of {len(part)}: {e}")
+                self._failed += len(part)
+                return FAILED
+        return RETRY_LATER
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._queue),
+            "in_flight": self._in_flight,
+            "max_queue_depth": self._max_depth,
+            "queue_capacity": self.max_queue,
+            "enqueued": self._enqueued,
+            "dropped": self._dropped,
+            "written": self._written,
+            "failed": self._failed,
+            "batches": self._batches,
+            "retries": self._retries,
+            "splits": self._splits,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+        }
@@ -0,0 +1,33 @@
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlmodel import Session
+from typing import List
+from app.config.db import engine
+from app.models.click import Click
+from app.services.batch_writer import BatchWriter
+from app.services.storage import SyncStorageManager
+import os
+
+CLICK_FLUSH_EVENTS = int(os.environ.get("CLICK_FLUSH_EVENTS", "100"))
+CLICK_FLUSH_INTERVAL_MS = int(os.environ.get("CLICK_FLUSH_INTERVAL_MS", "250"))
+CLICK_WRITE_RETRIES = int(os.environ.get("CLICK_WRITE_RETRIES", "5"))
+
+
+def persist_clicks(clicks: List[Click]) -> None:
+    with Session(engine) as session:
+        SyncStorageManager(session).add_clicks(clicks)
+
+
+# Create a global instance of the click writer. The queue is unbounded and
+# lock contention ("database is locked") is retried, so an accepted click is
+# only lost if the database stays unavailable through shutdown. A click for an
+# unknown product (foreign key violation) only rejects that click, not its batch.
+click_writer = BatchWriter(
+    "clicks",
+    persist_clicks,
+    max_batch=CLICK_FLUSH_EVENTS,
+    flush_interval_ms=CLICK_FLUSH_INTERVAL_MS,
+    max_queue=None,
+    retries=CLICK_WRITE_RETRIES,
+    retry_on=(OperationalError,),
+    split_on=(IntegrityError,),
+)
@@ -0,0 +1,98 @@
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Engine, text
+from typing import Optional
+from app.config.db import engine
+import asyncio
+import os
+import time
+
+SQLITE_CHECKPOINT_INTERVAL_SECONDS = float(os.environ.get("SQLITE_CHECKPOINT_INTERVAL_SECONDS", "300"))
+# PASSIVE never waits for readers or writers, TRUNCATE also shrinks the WAL file
+SQLITE_CHECKPOINT_MODE = os.environ.get("SQLITE_CHECKPOINT_MODE", "PASSIVE").upper()
+SQLITE_OPTIMIZE_INTERVAL_SECONDS = float(os.environ.get("SQLITE_OPTIMIZE_INTERVAL_SECONDS", "3600"))
+
+
+class SQLiteMaintenance:
+    """
+    Periodic WAL checkpoints and `PRAGMA optimize` for a SQLite database.
+
+    SQLite checkpoints the WAL on its own when a commit pushes it past 1000
+    pages, but only if no reader is in the way; under steady read traffic the
+    WAL keeps growing and every read gets slower. Checkpointing on a timer
+    keeps it bounded. `PRAGMA optimize` refreshes query planner statistics
+    for tables that changed a lot since the last run.
+    """
+    def __init__(
+        self,
+        db_engine: Engine,
+        checkpoint_interval: float = SQLITE_CHECKPOINT_INTERVAL_SECONDS,
+        checkpoint_mode: str = SQLITE_CHECKPOINT_MODE,
+        optimize_interval: float = SQLITE_OPTIMIZE_INTERVAL_SECONDS,
+    ):
+        self.engine = db_engine
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_mode = checkpoint_mode
+        self.optimize_interval = optimize_interval
+        self._last_optimize = time.monotonic()
+
+        self._checkpoints = 0
+        self._optimizes = 0
+        self._errors = 0
+        self._last_checkpoint: Optional[dict] = None
+        self._last_checkpoint_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine.dialect.name == "sqlite"
+
+    def checkpoint(self) -> dict:
+        start = time.perf_counter()
+        with self.engine.connect() as conn:
+            busy, log_frames, checkpointed = conn.execute(
+                text(f"PRAGMA wal_checkpoint({self.checkpoint_mode})")
+            ).one()
+        self._checkpoints += 1
+        self._last_checkpoint_ms = (time.perf_counter() - start) * 1000
+        # log_frames is -1 when the database is not in WAL mode
+        self._last_checkpoint = {"busy": busy, "wal_frames": log_frames, "checkpointed_frames": checkpointed}
+        return self._last_checkpoint
+
+    def optimize(self) -> None:
+        with self.engine.connect() as conn:
+            conn.execute(text("PRAGMA optimize"))
+        self._optimizes += 1
+        self._last_optimize = time.monotonic()
+
+    def run_once(self) -> None:
+        self.checkpoint()
+        if time.monotonic() - self._last_optimize >= self.optimize_interval:
+            self.optimize()
+
+    async def run_loop(self) -> None:
+        """
+        Checkpoint (and optimize) periodically. Meant to run as a background task.
+        """
+        if not self.enabled:
+            return
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception as e:
+                self._errors += 1
+                print(f"[ERROR] SQLite maintenance failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "checkpoint_mode": self.checkpoint_mode,
+            "checkpoints": self._checkpoints,
+            "last_checkpoint": self._last_checkpoint,
+            "last_checkpoint_ms": round(self._last_checkpoint_ms, 3),
+            "optimizes": self._optimizes,
+            "errors": self._errors,
+        }
+
+
+# Create a global instance of the SQLite maintenance task
+sqlite_maintenance = SQLiteMaintenance(engine)
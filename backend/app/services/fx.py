@@ -0,0 +1,126 @@
+from currency_converter import CurrencyConverter, CURRENCY_FILE
+from typing import Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import os
+import threading
+import time
+
+FX_RATES_SOURCE = os.environ.get("FX_RATES_SOURCE", CURRENCY_FILE)
+FX_REFRESH_HOURS = float(os.environ.get("FX_REFRESH_HOURS", "24"))
+
+
+class FXRateService:
+    """
+    Process-wide exchange rate table shared by every provider.
+
+    The ECB rate file is parsed once and the resulting conversion factors are
+    memoised per currency pair, so converting a price is a dict lookup and a
+    multiplication instead of a full reload of the rate file.
+    """
+    def __init__(self, source: str = FX_RATES_SOURCE, refresh_hours: float = FX_REFRESH_HOURS):
+        self.source = source
+        self.refresh_interval = refresh_hours * 3600
+        self._load_lock = threading.Lock()
+        self._converter: Optional[CurrencyConverter] = None
+        self._factors: Dict[Tuple[str, str], float] = {}
+        self._loaded_at: Optional[float] = None
+
+        self._loads = 0
+        self._load_errors = 0
+        self._last_load_ms = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._conversions = 0
+        self._convert_ns = 0
+
+    def refresh(self) -> None:
+        """
+        Reload the rate table from the configured source and swap it in.
+        The previous table is kept if the reload fails.
+        """
+        with self._load_lock:
+            self._load()
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        try:
+            converter = CurrencyConverter(self.source)
+        except Exception as e:
+            self._load_errors += 1
+            print(f"[ERROR] Failed to load FX rates from {self.source}: {e}")
+            if self._converter is None:
+                raise
+            return
+
+        self._factors = {}
+        self._converter = converter
+        self._loaded_at = time.time()
+        self._loads += 1
+        self._last_load_ms = (time.perf_counter() - start) * 1000
+
+    def _ensure_loaded(self) -> None:
+        if self._converter is None:
+            with self._load_lock:
+                if self._converter is None:
+                    self._load()
+
+    def rate(self, currency: str, to: str = "USD") -> float:
+        """
+        Return the factor that converts one unit of `currency` into `to`.
+        """
+        if currency == to:
+            return 1.0
+
+        key = (currency, to)
+        factor = self._factors.get(key)
+        if factor is not None:
+            self._hits += 1
+            return factor
+
+        self._misses += 1
+        self._ensure_loaded()
+        factor = self._converter.convert(1, currency, to)
+        self._factors[key] = factor
+        return factor
+
+    def convert(self, amount: float, currency: str, to: str = "USD") -> float:
+        return self.convert_many([amount], currency, to)[0]
+
+    def convert_many(self, amounts: List[float], currency: str, to: str = "USD") -> List[float]:
+        """
+        Convert a whole list of amounts with a single rate lookup.
+        """
+        start = time.perf_counter_ns()
+        factor = self.rate(currency, to)
+        converted = [amount * factor for amount in amounts]
+        self._conversions += len(amounts)
+        self._convert_ns += time.perf_counter_ns() - start
+        return converted
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "source": self.source,
+            "loaded_at": self._loaded_at,
+            "loads": self._loads,
+            "load_errors": self._load_errors,
+            "last_load_ms": round(self._last_load_ms, 3),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+            "conversions": self._conversions,
+            "avg_convert_us": round(self._convert_ns / self._conversions / 1000, 3) if self._conversions else None,
+        }
+
+    async def run_refresh_loop(self) -> None:
+        """
+        Periodically reload the rate table. Meant to run as a background task.
+        """
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await run_in_threadpool(self.refresh)
+
+
+# Create a global instance of the FX rate service
+fx_rates = FXRateService()
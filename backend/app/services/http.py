@@ -0,0 +1,103 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import aiohttp
+import asyncio
+import os
+import time
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "20"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_DNS_CACHE_TTL = int(os.environ.get("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+
+@dataclass
+class HttpResponse:
+    url: str
+    method: str
+    status_code: int
+    body: bytes
+    elapsed_ms: float
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+class HttpClient:
+    """
+    Shared asyncio HTTP client used by every provider.
+
+    Connections are pooled and kept alive between requests, DNS lookups are
+    cached and each upstream host gets its own connection limit.
+    """
+    def __init__(
+        self,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_connections_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._session is not None and not self._session.closed:
+                return
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            timeout = aiohttp.ClientTimeout(
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+    ) -> HttpResponse:
+        """
+        Fetch a URL and return the fully read response.
+        """
+        if self._session is None or self._session.closed:
+            await self.start()
+
+        start = time.perf_counter()
+        async with self._session.get(url, params=params, headers=headers) as response:
+            body = await response.read()
+            return HttpResponse(
+                url=str(response.url),
+                method=response.method,
+                status_code=response.status,
+                body=body,
+                elapsed_ms=(time.perf_counter() - start) * 1000,
+                headers=dict(response.headers),
+            )
+
+
+# Create a global instance of the HTTP client
+http_client = HttpClient()
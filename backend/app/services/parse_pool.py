@@ -0,0 +1,96 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Callable, Optional
+import asyncio
+import multiprocessing
+import os
+
+# Number of parser processes, 0 parses in the threadpool instead
+PARSE_POOL_SIZE = int(os.environ.get("PARSE_POOL_SIZE", str(os.cpu_count() or 2)))
+
+
+def _warm_up() -> None:
+    # Import the providers and compile their selectors before the first page arrives
+    from app.providers.flipkart import FlipkartScraper
+    FlipkartScraper.parsing_engine()
+
+
+class ParsePool:
+    """
+    Long-lived process pool for CPU-bound page parsing, so parsing scales
+    with CPU cores instead of being serialized by the GIL.
+
+    Functions run in the pool must be importable module-level functions and
+    should return compact, picklable records rather than model instances.
+    Without a running pool (or after the pool broke) work falls back to the
+    threadpool.
+    """
+    def __init__(self, size: int = PARSE_POOL_SIZE):
+        self.size = size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._fallbacks = 0
+        self._restarts = 0
+        self._busy = 0
+
+    def start(self) -> None:
+        if self._executor is not None or self.size <= 0:
+            return
+        # Fresh interpreters instead of forking a process that runs an event loop and threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        for _ in range(self.size):
+            self._executor.submit(_warm_up)
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        if self._executor is None:
+            self._fallbacks += 1
+            return await run_in_threadpool(fn, *args)
+
+        executor = self._executor
+        self._submitted += 1
+        self._busy += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            self._completed += 1
+            return result
+        except BrokenProcessPool:
+            self._failed += 1
+            # Parses failing together all see the same broken pool, only the first replaces it
+            if self._executor is executor:
+                print("[ERROR] Parse pool is broken, restarting it")
+                self._executor = None
+                self._restarts += 1
+                self.start()
+                # Reap the dead pool's processes without blocking the event loop
+                await run_in_threadpool(executor.shutdown, wait=True)
+            # Parse this page in a thread
+            self._fallbacks += 1
+            return await run_in_threadpool(fn, *args)
+        finally:
+            self._busy -= 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size if self._executor is not None else 0,
+            "busy": self._busy,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "thread_fallbacks": self._fallbacks,
+            "restarts": self._restarts,
+        }
+
+
+# Create a global instance of the parse pool
+parse_pool = ParsePool()
@@ -0,0 +1,154 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict
+from app.config.db import async_engine
+from app.providers.flipkart import FlipkartScraper
+from app.providers.amazon import AmazonAPIWrapper
+from app.providers.base import PageError
+from app.services.storage import StorageManager
+from app.services.scrape_jobs import ScrapeJob, scrape_registry
+import asyncio
+import os
+
+# Provider name -> factory. Every enabled provider runs concurrently.
+PROVIDERS = {
+    "flipkart": lambda: FlipkartScraper(),
+    "amazon": lambda: AmazonAPIWrapper(os.environ.get("SCRAPEHERO_API")),
+}
+
+# Maximum number of searches a provider runs at the same time
+PROVIDER_CONCURRENCY = {
+    "flipkart": int(os.environ.get("FLIPKART_MAX_CONCURRENT_SCRAPES", "4")),
+    "amazon": int(os.environ.get("AMAZON_MAX_CONCURRENT_SCRAPES", "2")),
+}
+
+_provider_limits: Dict[str, asyncio.Semaphore] = {}
+_provider_active: Dict[str, int] = {name: 0 for name in PROVIDERS}
+_provider_waiting: Dict[str, int] = {name: 0 for name in PROVIDERS}
+
+
+def _provider_limit(name: str) -> asyncio.Semaphore:
+    if name not in _provider_limits:
+        _provider_limits[name] = asyncio.Semaphore(PROVIDER_CONCURRENCY.get(name, 1))
+    return _provider_limits[name]
+
+
+def provider_stats() -> dict:
+    return {
+        name: {
+            "limit": PROVIDER_CONCURRENCY.get(name, 1),
+            "active": _provider_active.get(name, 0),
+            "waiting": _provider_waiting.get(name, 0),
+        }
+        for name in PROVIDERS
+    }
+
+
+async def run_scrapers_and_update(
+    query, 
+    pages, 
+    filters, 
+    enabled_scrapers, 
+    job: ScrapeJob
+):
+    """
+    Run scrapers in the background and update results via WebSockets.
+
+    Enabled providers run concurrently and stream their results page by page:
+    every parsed page is saved and broadcast as its own `update` frame, tagged
+    with the page number and the job's sequence number. A page that fails gets
+    a `page_error` frame instead. A provider whose pages all fail gets an
+    `error` frame and is left out of `complete`; it does not hold back the
+    others. Updates go to every search attached to the job.
+    """
+    try:
+        sources = [name for name in PROVIDERS if enabled_scrapers.get(name, True)]
+        succeeded = await asyncio.gather(
+            *(_run_provider(name, query, pages, filters, job) for name in sources)
+        )
+        completed = [name for name, ok in zip(sources, succeeded) if ok]
+
+        # Send final completion message
+        await scrape_registry.broadcast(
+            job, 
+            {
+                "type": "complete",
+                "query": query,
+                "sources": completed
+            }
+        )
+    finally:
+        scrape_registry.finish(job)
+
+    print(f"Scraping completed for query: {query}")
+
+
+async def _run_provider(name, query, pages, filters, job: ScrapeJob) -> bool:
+    try:
+        await _scrape_provider(name, query, pages, filters, job)
+        return True
+    except Exception as e:
+        print(f"[ERROR] {name} scrape failed for query {query}: {e}")
+        await scrape_registry.broadcast(job, {"type": "error", "source": name, "query": query})
+        return False
+
+
+async def _scrape_provider(name, query, pages, filters, job: ScrapeJob):
+    _provider_waiting[name] = _provider_waiting.get(name, 0) + 1
+    try:
+        await _provider_limit(name).acquire()
+    finally:
+        _provider_waiting[name] -= 1
+
+    try:
+        _provider_active[name] = _provider_active.get(name, 0) + 1
+        try:
+            provider = PROVIDERS[name]()
+            scraped, failed = 0, 0
+            async for page, products in provider.iter_pages(query, max_pages=pages, filters=filters):
+                if isinstance(products, PageError):
+                    failed += 1
+                    await _publish_page(name, query, page, products, job)
+                    continue
+                scraped += 1
+                if products:
+                    await _publish_page(name, query, page, products, job)
+            if failed and not scraped:
+                raise RuntimeError(f"all {failed} pages failed")
+        finally:
+            _provider_active[name] -= 1
+    finally:
+        _provider_limit(name).release()
+
+
+async def _publish_page(name, query, page, products, job: ScrapeJob):
+    if isinstance(products, PageError):
+        # Lets clients tell a failed page from one without products
+        await scrape_registry.broadcast(
+            job,
+            {
+                "type": "page_error",
+                "source": name,
+                "page": page,
+                "error": str(products.error),
+                "query": query
+            }
+        )
+        return
+
+    # Create a new session for this background task since the request's might be closed.
+    # save_products returns the stored rows, keep them loaded after the commit.
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        saved = await StorageManager(session).save_products(products)
+        results = [p.model_dump(mode="json") for p in saved]
+
+    # Notify clients as soon as this page is available
+    await scrape_registry.broadcast(
+        job, 
+        {
+            "type": "update",
+            "source": name,
+            "page": page,
+            "results": results,
+            "query": query
+        }
+    )
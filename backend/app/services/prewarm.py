@@ -0,0 +1,237 @@
+from datetime import datetime, timezone
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict, Hashable, List, Optional, Tuple
+from app.config.db import async_engine
+from app.services.scheduler import REFRESH, scrape_scheduler
+from app.services.scrape_jobs import ScrapeKey, scrape_registry
+from app.services.settings import config_store
+from app.services.storage import StorageManager, latest_timestamp
+import asyncio
+import os
+import time
+
+PREWARM_INTERVAL_SECONDS = float(os.environ.get("PREWARM_INTERVAL_SECONDS", "60"))
+PREWARM_TOP_N = int(os.environ.get("PREWARM_TOP_N", "20"))
+PREWARM_MIN_HITS = float(os.environ.get("PREWARM_MIN_HITS", "3"))
+PREWARM_LEAD_SECONDS = float(os.environ.get("PREWARM_LEAD_SECONDS", "120"))
+PREWARM_PAGE_BUDGET = int(os.environ.get("PREWARM_PAGE_BUDGET", "10"))
+PREWARM_SKETCH_SIZE = int(os.environ.get("PREWARM_SKETCH_SIZE", "512"))
+# Counts are multiplied by this every cycle so popularity follows recent traffic
+PREWARM_DECAY = float(os.environ.get("PREWARM_DECAY", "0.9"))
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters sketch: approximate top-k counts in fixed memory.
+
+    At most `capacity` keys are tracked. A new key replaces the one with the
+    lowest count and inherits that count as its possible overestimate, so any
+    key seen more than `total / capacity` times is guaranteed to be tracked.
+    """
+    def __init__(self, capacity: int = PREWARM_SKETCH_SIZE):
+        self.capacity = capacity
+        self._counts: Dict[Hashable, float] = {}
+        self._errors: Dict[Hashable, float] = {}
+
+    def offer(self, key: Hashable) -> Optional[Hashable]:
+        """
+        Count one occurrence of `key`. Returns the evicted key, if any.
+        """
+        if key in self._counts:
+            self._counts[key] += 1
+            return None
+
+        evicted = None
+        floor = 0.0
+        if len(self._counts) >= self.capacity:
+            evicted = min(self._counts, key=self._counts.__getitem__)
+            floor = self._counts.pop(evicted)
+            del self._errors[evicted]
+
+        self._counts[key] = floor + 1
+        self._errors[key] = floor
+        return evicted
+
+    def top(self, n: int) -> List[Tuple[Hashable, float, float]]:
+        """
+        The `n` most frequent keys as `(key, count, error)`, most frequent first.
+        """
+        keys = sorted(self._counts, key=self._counts.__getitem__, reverse=True)[:n]
+        return [(key, self._counts[key], self._errors[key]) for key in keys]
+
+    def decay(self, factor: float) -> None:
+        for key in self._counts:
+            self._counts[key] *= factor
+            self._errors[key] *= factor
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+class Prewarmer:
+    """
+    Keeps popular searches fresh by re-scraping them shortly before their
+    cooldown expires, so they keep being served from cache.
+
+    `/search` traffic is counted in a Space-Saving sketch. Every cycle the
+    top queries whose newest stored products are within `lead_seconds` of the
+    cooldown are submitted to the scrape scheduler at refresh priority, until
+    the cycle's page budget (pages times enabled providers) is spent.
+    """
+    def __init__(
+        self,
+        interval_seconds: float = PREWARM_INTERVAL_SECONDS,
+        top_n: int = PREWARM_TOP_N,
+        min_hits: float = PREWARM_MIN_HITS,
+        lead_seconds: float = PREWARM_LEAD_SECONDS,
+        page_budget: int = PREWARM_PAGE_BUDGET,
+        sketch_size: int = PREWARM_SKETCH_SIZE,
+        decay: float = PREWARM_DECAY,
+    ):
+        self.interval = interval_seconds
+        self.top_n = top_n
+        self.min_hits = min_hits
+        self.lead_seconds = lead_seconds
+        self.page_budget = page_budget
+        self.decay = decay
+        self.sketch = SpaceSaving(sketch_size)
+        # Last refresh submitted per tracked key, so queries without results are not re-scraped every cycle
+        self._submitted_at: Dict[ScrapeKey, float] = {}
+
+        self._cycles = 0
+        self._submitted = 0
+        self._fresh = 0
+        self._rejected = 0
+        self._last_pages = 0
+        self._last_cycle_ms = 0.0
+
+    def record(self, query: Optional[str], pages: int, min_price: Optional[int], max_price: Optional[int]) -> None:
+        """
+        Count a search. Cheap enough to call on every request.
+        """
+        key = scrape_registry.make_key(query, pages, min_price, max_price)
+        if not key[0]:
+            return
+        evicted = self.sketch.offer(key)
+        if evicted is not None:
+            self._submitted_at.pop(evicted, None)
+
+    async def run_loop(self) -> None:
+        """
+        Periodically refresh popular queries. Meant to run as a background task.
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"[ERROR] Prewarm cycle failed: {e}")
+
+    async def run_once(self) -> int:
+        """
+        Run one prewarm cycle. Returns the number of scrapes submitted.
+        """
+        start = time.perf_counter()
+        config = config_store.get()
+        enabled_scrapers = dict(config.enabled_scrapers)
+        providers = [name for name, enabled in enabled_scrapers.items() if enabled]
+        refresh_after = max(0.0, config.cooldown.total_seconds() - self.lead_seconds)
+
+        candidates = [key for key, count, _ in self.sketch.top(self.top_n) if count >= self.min_hits]
+        self.sketch.decay(self.decay)
+
+        now = time.time()
+        candidates = [
+            key for key in candidates
+            if now - self._submitted_at.get(key, 0.0) >= refresh_after and scrape_registry.get(key) is None
+        ]
+        if not providers or not candidates:
+            self._finish_cycle(start, 0)
+            return 0
+
+        ages = await self._ages(candidates, providers)
+
+        submitted, pages_used = 0, 0
+        for key in candidates:
+            age = ages[key]
+            if age is not None and age < refresh_after:
+                self._fresh += 1
+                continue
+
+            query, pages, min_price, max_price = key
+            cost = pages * len(providers)
+            if pages_used + cost > self.page_budget:
+                continue
+
+            # No client is waiting, so nothing is published until a search attaches
+            job, created = scrape_registry.join(key, None)
+            if not created:
+                continue
+
+            filters = {name: value for name, value in (("min_price", min_price), ("max_price", max_price)) if value}
+            if not scrape_scheduler.submit(
+                job,
+                REFRESH,
+                query=query,
+                pages=pages,
+                filters=filters,
+                enabled_scrapers=enabled_scrapers,
+            ):
+                # The scheduler is busy with interactive searches, try again next cycle
+                scrape_registry.finish(job)
+                self._rejected += 1
+                break
+
+            self._submitted_at[key] = now
+            pages_used += cost
+            submitted += 1
+
+        self._submitted += submitted
+        self._finish_cycle(start, pages_used)
+        if submitted:
+            print(f"[INFO] Prewarm submitted {submitted} refreshes ({pages_used} provider pages)")
+        return submitted
+
+    def _finish_cycle(self, start: float, pages: int) -> None:
+        self._cycles += 1
+        self._last_pages = pages
+        self._last_cycle_ms = (time.perf_counter() - start) * 1000
+
+    async def _ages(self, keys: List[ScrapeKey], providers: List[str]) -> Dict[ScrapeKey, Optional[float]]:
+        """
+        Age in seconds of the newest stored product for each search, like `/search` sees it.
+        """
+        now = datetime.now(timezone.utc)
+        ages = {}
+        async with AsyncSession(async_engine) as session:
+            storage = StorageManager(session)
+            for key in keys:
+                query, _, min_price, max_price = key
+                products = []
+                for source in providers:
+                    products.extend(await storage.get_search_results(query, source, min_price, max_price))
+                latest = latest_timestamp(products)
+                ages[key] = (now - latest).total_seconds() if latest else None
+        return ages
+
+    def stats(self) -> dict:
+        return {
+            "tracked_queries": len(self.sketch),
+            "sketch_capacity": self.sketch.capacity,
+            "top": [
+                {"query": key[0], "pages": key[1], "min_price": key[2], "max_price": key[3],
+                 "count": round(count, 2), "error": round(error, 2)}
+                for key, count, error in self.sketch.top(self.top_n)
+            ],
+            "cycles": self._cycles,
+            "submitted": self._submitted,
+            "fresh": self._fresh,
+            "rejected": self._rejected,
+            "last_cycle_pages": self._last_pages,
+            "page_budget": self.page_budget,
+            "last_cycle_ms": round(self._last_cycle_ms, 3),
+        }
+
+
+# Create a global instance of the prewarmer
+prewarmer = Prewarmer()
@@ -0,0 +1,186 @@
+from typing import Callable, List, Optional
+import aiosqlite
+import asyncio
+import json
+import os
+import time
+import uuid
+
+# "memory" delivers within this process only, "sqlite" shares messages between
+# processes on the same host (e.g. uvicorn --workers N)
+PUBSUB_BACKEND = os.environ.get("PUBSUB_BACKEND", "memory").lower()
+PUBSUB_SQLITE_PATH = os.environ.get("PUBSUB_SQLITE_PATH", "data/pubsub.db")
+PUBSUB_POLL_INTERVAL_MS = int(os.environ.get("PUBSUB_POLL_INTERVAL_MS", "50"))
+PUBSUB_RETENTION_SECONDS = float(os.environ.get("PUBSUB_RETENTION_SECONDS", "60"))
+
+# Called with the target search IDs (None for everyone) and the serialized message
+Deliver = Callable[[Optional[List[str]], str], None]
+
+
+class PubSubBackend:
+    """
+    Carries serialized WebSocket messages to every process serving clients.
+    `deliver` hands a message to this process's connections.
+    """
+    name = "base"
+    # Whether other processes may have subscribers
+    shared = False
+
+    def __init__(self, deliver: Deliver):
+        self.deliver = deliver
+        self._published = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, search_ids: Optional[List[str]], payload: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "published": self._published}
+
+
+class MemoryPubSub(PubSubBackend):
+    """
+    Delivers straight to the local connections. Only correct with a single worker.
+    """
+    name = "memory"
+
+    async def publish(self, search_ids: Optional[List[str]], payload: str) -> None:
+        self._published += 1
+        self.deliver(search_ids, payload)
+
+
+class SQLitePubSub(PubSubBackend):
+    """
+    Shares messages between processes through a small SQLite table.
+
+    A message is delivered locally right away and appended to the table.
+    Every process polls for rows written by the others; the poll only reads
+    the table when `PRAGMA data_version` reports a commit from another
+    connection, so an idle poll costs one pragma. Rows older than the
+    retention period are pruned.
+    """
+    name = "sqlite"
+    shared = True
+
+    def __init__(
+        self,
+        deliver: Deliver,
+        path: str = PUBSUB_SQLITE_PATH,
+        poll_interval_ms: int = PUBSUB_POLL_INTERVAL_MS,
+        retention_seconds: float = PUBSUB_RETENTION_SECONDS,
+    ):
+        super().__init__(deliver)
+        self.path = path
+        self.poll_interval = poll_interval_ms / 1000
+        self.retention = retention_seconds
+        # Identifies this process's rows so they are not delivered twice
+        self.origin = str(uuid.uuid4())
+        self._db: Optional[aiosqlite.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_id = 0
+        self._data_version: Optional[int] = None
+        self._last_prune = time.monotonic()
+
+        self._received = 0
+        self._errors = 0
+        self._max_lag_ms = 0.0
+
+    async def start(self) -> None:
+        if self._db is not None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Autocommit, every message is its own transaction
+        self._db = await aiosqlite.connect(self.path, isolation_level=None)
+        await self._db.execute("PRAGMA busy_timeout=5000")
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        await self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pubsub_message ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, created REAL NOT NULL, "
+            "search_ids TEXT, payload TEXT NOT NULL)"
+        )
+        # Only messages published from now on are delivered
+        rows = await self._db.execute_fetchall("SELECT coalesce(max(id), 0) FROM pubsub_message")
+        self._last_id = rows[0][0]
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def publish(self, search_ids: Optional[List[str]], payload: str) -> None:
+        self._published += 1
+        self.deliver(search_ids, payload)
+        if self._db is None:
+            return
+        try:
+            await self._db.execute(
+                "INSERT INTO pubsub_message (origin, created, search_ids, payload) VALUES (?, ?, ?, ?)",
+                (self.origin, time.time(), json.dumps(search_ids), payload),
+            )
+        except Exception as e:
+            self._errors += 1
+            print(f"[ERROR] Failed to publish message to other workers: {e}")
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._poll()
+            except Exception as e:
+                self._errors += 1
+                print(f"[ERROR] Pub/sub poll failed: {e}")
+
+    async def _poll(self) -> None:
+        rows = await self._db.execute_fetchall("PRAGMA data_version")
+        version = rows[0][0]
+        if version != self._data_version:
+            self._data_version = version
+            rows = await self._db.execute_fetchall(
+                "SELECT id, origin, created, search_ids, payload FROM pubsub_message WHERE id > ? ORDER BY id",
+                (self._last_id,),
+            )
+            now = time.time()
+            for message_id, origin, created, search_ids, payload in rows:
+                self._last_id = message_id
+                if origin == self.origin:
+                    continue
+                self._received += 1
+                self._max_lag_ms = max(self._max_lag_ms, (now - created) * 1000)
+                self.deliver(json.loads(search_ids), payload)
+
+        if time.monotonic() - self._last_prune >= self.retention:
+            self._last_prune = time.monotonic()
+            await self._db.execute("DELETE FROM pubsub_message WHERE created < ?", (time.time() - self.retention,))
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "running": self._task is not None,
+            "received": self._received,
+            "errors": self._errors,
+            "max_lag_ms": round(self._max_lag_ms, 3),
+        }
+
+
+PUBSUB_BACKENDS = {
+    "memory": MemoryPubSub,
+    "sqlite": SQLitePubSub,
+}
+
+
+def create_pubsub(deliver: Deliver, backend: str = PUBSUB_BACKEND) -> PubSubBackend:
+    backend_class = PUBSUB_BACKENDS.get(backend)
+    if backend_class is None:
+        raise ValueError(f"Unknown PUBSUB_BACKEND {backend!r}, expected one of {', '.join(PUBSUB_BACKENDS)}")
+    return backend_class(deliver)
@@ -0,0 +1,190 @@
+from typing import Dict, Optional
+from app.services.settings import ScraperLimits, config_store
+import asyncio
+import os
+import random
+import time
+
+# Defaults for providers without limits in ScraperConfig, a rate of 0 disables limiting
+PROVIDER_RATE_PER_SEC = float(os.environ.get("PROVIDER_RATE_PER_SEC", "2"))
+PROVIDER_BURST = int(os.environ.get("PROVIDER_BURST", "4"))
+PROVIDER_MAX_RETRIES = int(os.environ.get("PROVIDER_MAX_RETRIES", "3"))
+
+# Retries may add at most this fraction of extra requests on top of first attempts
+PROVIDER_RETRY_BUDGET = float(os.environ.get("PROVIDER_RETRY_BUDGET", "0.2"))
+PROVIDER_RETRY_BASE_MS = int(os.environ.get("PROVIDER_RETRY_BASE_MS", "250"))
+PROVIDER_RETRY_MAX_MS = int(os.environ.get("PROVIDER_RETRY_MAX_MS", "10000"))
+
+# AIMD: add this fraction of the configured rate per success, multiply by the
+# decrease factor on throttling, never going below the minimum fraction
+AIMD_INCREASE = 0.05
+AIMD_DECREASE = 0.5
+AIMD_MIN_FRACTION = 0.05
+
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Retry tokens that can be saved up while the provider is healthy
+RETRY_BUDGET_CAP = 10.0
+
+
+class ProviderLimiter:
+    """
+    Token bucket for one upstream provider, shared by every concurrent scrape.
+
+    The refill rate adapts AIMD-style between a floor and the configured rate:
+    each successful response nudges it up and each throttling response (429 or
+    503) halves it, at most once per refill interval so a burst of throttled
+    responses that were already in flight only counts once. Retries are drawn
+    from a budget that grows with first attempts, so a failing provider is not
+    hit with a multiple of the normal traffic.
+    """
+    def __init__(self, name: str, limits: ScraperLimits = ScraperLimits()):
+        self.name = name
+        self._lock = asyncio.Lock()
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._budget = RETRY_BUDGET_CAP
+        self.rate = float("inf")
+        self.configure(limits)
+        self._tokens = float(self.burst)
+
+        self._requests = 0
+        self._throttled = 0
+        self._retries = 0
+        self._retries_denied = 0
+        self._wait_s = 0.0
+
+    def configure(self, limits: ScraperLimits) -> None:
+        previous_max = getattr(self, "max_rate", None)
+        self.max_rate = limits.rate_per_sec if limits.rate_per_sec is not None else PROVIDER_RATE_PER_SEC
+        self.burst = max(1, limits.burst if limits.burst is not None else PROVIDER_BURST)
+        self.max_retries = limits.max_retries if limits.max_retries is not None else PROVIDER_MAX_RETRIES
+        self.min_rate = self.max_rate * AIMD_MIN_FRACTION
+        if previous_max is None or self.max_rate > previous_max or self.rate <= 0:
+            # A raised (or re-enabled) limit starts at full speed, AIMD backs off again if needed
+            self.rate = self.max_rate
+        else:
+            # A lowered limit keeps any backoff already in effect
+            self.rate = min(self.rate, self.max_rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """
+        Wait for a token. Waiters are served in arrival order.
+        """
+        if self.max_rate <= 0:
+            return
+
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / max(self.rate, self.min_rate, 1e-3))
+                self._refill()
+            self._tokens -= 1
+        self._wait_s += time.monotonic() - start
+
+    def record_attempt(self, retry: bool) -> None:
+        self._requests += 1
+        if retry:
+            self._retries += 1
+        else:
+            self._budget = min(RETRY_BUDGET_CAP, self._budget + PROVIDER_RETRY_BUDGET)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * AIMD_INCREASE)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        self._throttled += 1
+        if self.max_rate <= 0:
+            return
+
+        now = time.monotonic()
+        if self.rate > 0 and now - self._last_decrease >= 1 / self.rate:
+            self.rate = max(self.min_rate, self.rate * AIMD_DECREASE)
+            self._last_decrease = now
+
+        # Drain the bucket so nobody else goes out before the provider recovers
+        self._refill()
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._tokens = min(self._tokens, -retry_after * self.rate)
+
+    def allow_retry(self, attempt: int) -> bool:
+        """
+        Take a retry token for retry number `attempt` if the budget allows it.
+        """
+        if attempt > self.max_retries:
+            return False
+        if self._budget < 1:
+            self._retries_denied += 1
+            return False
+        self._budget -= 1
+        return True
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Full-jitter exponential backoff in seconds, at least `retry_after`.
+        """
+        ceiling = min(PROVIDER_RETRY_MAX_MS, PROVIDER_RETRY_BASE_MS * 2 ** (attempt - 1)) / 1000
+        return max(random.uniform(0, ceiling), retry_after or 0.0)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "rate_per_sec": round(self.rate, 3),
+            "max_rate_per_sec": self.max_rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 3),
+            "max_retries": self.max_retries,
+            "retry_budget": round(self._budget, 2),
+            "requests": self._requests,
+            "throttled": self._throttled,
+            "retries": self._retries,
+            "retries_denied": self._retries_denied,
+            "wait_s": round(self._wait_s, 3),
+        }
+
+
+class RateLimiterRegistry:
+    """
+    One limiter per provider, kept in line with the limits in the config snapshot.
+    """
+    def __init__(self):
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._version: Optional[int] = None
+
+    def get(self, name: str) -> ProviderLimiter:
+        snapshot = config_store.get()
+        if snapshot.version != self._version:
+            for provider, limiter in self._limiters.items():
+                limiter.configure(snapshot.scraper_limits.get(provider, ScraperLimits()))
+            self._version = snapshot.version
+
+        limiter = self._limiters.get(name)
+        if limiter is None:
+            limiter = ProviderLimiter(name, snapshot.scraper_limits.get(name, ScraperLimits()))
+            self._limiters[name] = limiter
+        return limiter
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds from a Retry-After header. HTTP dates are ignored.
+    """
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+# Create a global instance of the provider rate limiters
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,51 @@
+from sqlalchemy import insert
+from sqlmodel import Session
+from typing import List, Optional
+from app.config.db import engine
+from app.models.api_request_log import ApiRequestLog
+from app.services.batch_writer import BatchWriter
+import os
+
+REQUEST_LOG_FLUSH_EVENTS = int(os.environ.get("REQUEST_LOG_FLUSH_EVENTS", "100"))
+REQUEST_LOG_FLUSH_INTERVAL_MS = int(os.environ.get("REQUEST_LOG_FLUSH_INTERVAL_MS", "2000"))
+REQUEST_LOG_QUEUE_SIZE = int(os.environ.get("REQUEST_LOG_QUEUE_SIZE", "10000"))
+
+
+def persist_request_logs(entries: List[ApiRequestLog]) -> None:
+    with Session(engine) as session:
+        session.exec(
+            insert(ApiRequestLog),
+            params=[entry.model_dump(exclude={"id"}) for entry in entries]
+        )
+        session.commit()
+
+
+# Create a global instance of the request log writer
+request_log_writer = BatchWriter(
+    "api_requests",
+    persist_request_logs,
+    max_batch=REQUEST_LOG_FLUSH_EVENTS,
+    flush_interval_ms=REQUEST_LOG_FLUSH_INTERVAL_MS,
+    max_queue=REQUEST_LOG_QUEUE_SIZE,
+)
+
+
+def record_request(
+    endpoint: str,
+    status_code: int,
+    method: str,
+    latency_ms: Optional[float] = None,
+    response_bytes: Optional[int] = None,
+    query: Optional[str] = None,
+) -> None:
+    """
+    Record an upstream provider call. The entry is written in the background.
+    """
+    request_log_writer.put(ApiRequestLog(
+        endpoint=endpoint,
+        status_code=status_code,
+        method=method,
+        latency_ms=round(latency_ms, 3) if latency_ms is not None else None,
+        response_bytes=response_bytes,
+        query=query,
+    ))
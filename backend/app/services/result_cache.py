@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from app.services.scrape_jobs import normalize_query
+import os
+import threading
+import time
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "60"))
+
+CacheKey = Tuple[str, Optional[str], Optional[float], Optional[float]]
+
+
+class ResultCache:
+    """
+    Bounded in-process cache of `/search` lookups with TTL and LRU eviction.
+    Entries for a query are dropped when products for that query are saved.
+    """
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl_seconds: float = RESULT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def make_key(query: Optional[str], source: Optional[str], min_price: Optional[float], max_price: Optional[float]) -> CacheKey:
+        return (normalize_query(query), source, min_price, max_price)
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: CacheKey, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate_query(self, query: Optional[str]) -> None:
+        """
+        Drop every cached entry for a query, whatever the source or price range.
+        """
+        normalized = normalize_query(query)
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == normalized]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "invalidations": self._invalidations,
+        }
+
+
+# Create a global instance of the result cache
+result_cache = ResultCache()
@@ -0,0 +1,147 @@
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.services.pipeline import provider_stats, run_scrapers_and_update
+from app.services.scrape_jobs import ScrapeJob, scrape_registry
+import asyncio
+import itertools
+import os
+import time
+
+# Job priorities, lower runs first
+INTERACTIVE = 0
+REFRESH = 1
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", REFRESH: "refresh"}
+
+SCRAPE_WORKERS = int(os.environ.get("SCRAPE_WORKERS", "4"))
+SCRAPE_QUEUE_SIZE = int(os.environ.get("SCRAPE_QUEUE_SIZE", "100"))
+# Retry-After sent with searches that were answered without scraping
+SHED_RETRY_AFTER_SECONDS = int(os.environ.get("SCRAPE_RETRY_AFTER_SECONDS", "5"))
+
+
+@dataclass(order=True)
+class ScheduledScrape:
+    priority: int
+    order: int
+    job: ScrapeJob = field(compare=False)
+    kwargs: Dict[str, Any] = field(compare=False)
+    enqueued_at: float = field(compare=False, default_factory=time.perf_counter)
+
+
+class ScrapeScheduler:
+    """
+    Runs scrape jobs on a fixed number of workers, pulling from a bounded
+    priority queue so interactive searches go before background refreshes.
+
+    `submit` never waits: when the queue is full the job is rejected and the
+    caller is expected to answer from cache instead. Refresh jobs may only use
+    half of the queue, so they can never crowd out interactive searches.
+    Per-provider concurrency caps still apply inside each job.
+    """
+    def __init__(
+        self,
+        run: Callable[..., Awaitable[None]],
+        workers: int = SCRAPE_WORKERS,
+        max_queue: int = SCRAPE_QUEUE_SIZE,
+    ):
+        self.run = run
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._order = itertools.count()
+
+        self._busy = 0
+        self._queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self._submitted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._rejected = {priority: 0 for priority in PRIORITY_NAMES}
+        self._completed = 0
+        self._failed = 0
+        self._max_depth = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Jobs that never ran must not stay registered as in flight
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            scrape_registry.finish(item.job)
+        self._queue = None
+
+    def submit(self, job: ScrapeJob, priority: int = INTERACTIVE, **kwargs) -> bool:
+        """
+        Queue a scrape job. Returns False if it was shed because the queue is
+        full (or the scheduler is not running).
+        """
+        if self._queue is None:
+            print("[WARN] Scrape scheduler is not running, rejecting job")
+            self._rejected[priority] += 1
+            return False
+
+        limit = self.max_queue if priority == INTERACTIVE else self.max_queue // 2
+        if self._queue.qsize() >= limit:
+            self._rejected[priority] += 1
+            return False
+
+        self._queue.put_nowait(ScheduledScrape(priority, next(self._order), job, kwargs))
+        self._submitted[priority] += 1
+        self._queued[priority] += 1
+        self._max_depth = max(self._max_depth, self._queue.qsize())
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            self._queued[item.priority] -= 1
+            self._busy += 1
+
+            wait_ms = (time.perf_counter() - item.enqueued_at) * 1000
+            self._wait_ms_total += wait_ms
+            self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+
+            try:
+                await self.run(job=item.job, **item.kwargs)
+                self._completed += 1
+            except asyncio.CancelledError:
+                scrape_registry.finish(item.job)
+                raise
+            except Exception as e:
+                self._failed += 1
+                scrape_registry.finish(item.job)
+                print(f"[ERROR] Scrape job {item.job.key} failed: {e}")
+            finally:
+                self._busy -= 1
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        started = self._completed + self._failed + self._busy
+        return {
+            "workers": len(self._tasks),
+            "busy": self._busy,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.max_queue,
+            "max_queue_depth": self._max_depth,
+            "queued": {PRIORITY_NAMES[p]: n for p, n in self._queued.items()},
+            "submitted": {PRIORITY_NAMES[p]: n for p, n in self._submitted.items()},
+            "rejected": {PRIORITY_NAMES[p]: n for p, n in self._rejected.items()},
+            "completed": self._completed,
+            "failed": self._failed,
+            "avg_wait_ms": round(self._wait_ms_total / started, 3) if started else None,
+            "max_wait_ms": round(self._wait_ms_max, 3),
+            "providers": provider_stats(),
+        }
+
+
+# Create a global instance of the scrape scheduler
+scrape_scheduler = ScrapeScheduler(run_scrapers_and_update)
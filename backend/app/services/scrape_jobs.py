@@ -0,0 +1,101 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+from app.services.websocket import manager as websocket_manager
+import time
+
+ScrapeKey = Tuple[str, int, Optional[int], Optional[int]]
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """
+    Case- and whitespace-insensitive form of a search query.
+    """
+    return " ".join((query or "").lower().split())
+
+
+@dataclass
+class ScrapeJob:
+    key: ScrapeKey
+    search_ids: Set[str] = field(default_factory=set)
+    started_at: float = field(default_factory=time.time)
+    seq: int = 0
+    # Messages broadcast so far, for searches that attach while the job runs
+    history: List[Dict[str, Any]] = field(default_factory=list)
+
+    def next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+
+class ScrapeRegistry:
+    """
+    Registry of in-flight scrapes keyed by normalized query, pages and price
+    filters, so concurrent searches for the same thing share one scrape.
+    """
+    def __init__(self):
+        self._jobs: Dict[ScrapeKey, ScrapeJob] = {}
+        self._started = 0
+        self._coalesced = 0
+
+    @staticmethod
+    def make_key(query: Optional[str], pages: int, min_price: Optional[int], max_price: Optional[int]) -> ScrapeKey:
+        return (normalize_query(query), pages, min_price or None, max_price or None)
+
+    def get(self, key: ScrapeKey) -> Optional[ScrapeJob]:
+        return self._jobs.get(key)
+
+    def join(self, key: ScrapeKey, search_id: Optional[str]) -> Tuple[ScrapeJob, bool]:
+        """
+        Attach `search_id` to the in-flight scrape for `key`, registering a new
+        job if there is none. Returns the job and whether it was just created,
+        in which case the caller is responsible for running it.
+
+        Background owners with no client to notify pass None: the job's
+        messages are then only published once a search attaches to it.
+        """
+        job = self._jobs.get(key)
+        created = job is None
+        if created:
+            job = ScrapeJob(key=key)
+            self._jobs[key] = job
+            self._started += 1
+        else:
+            self._coalesced += 1
+        if search_id is not None:
+            job.search_ids.add(search_id)
+        return job, created
+
+    def finish(self, job: ScrapeJob) -> None:
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+
+    async def broadcast(self, job: ScrapeJob, message: Any) -> None:
+        """
+        Send a message to every search attached to the job. Messages are
+        numbered with a per-job sequence number so clients can order them.
+        """
+        message = {**message, "seq": job.next_seq()}
+        job.history.append(message)
+        if not job.search_ids:
+            # Kept in the history for searches that attach later
+            return
+        await websocket_manager.broadcast_to_searches(list(job.search_ids), message)
+
+    async def catch_up(self, job: ScrapeJob, search_id: str) -> None:
+        """
+        Send the messages the job broadcast before `search_id` attached to it.
+        Call right after `join`: later messages already reach the search live.
+        """
+        for message in list(job.history):
+            await websocket_manager.broadcast_to_search(search_id, message)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._jobs),
+            "started": self._started,
+            "coalesced": self._coalesced,
+        }
+
+
+# Create a global instance of the scrape registry
+scrape_registry = ScrapeRegistry()
@@ -0,0 +1,146 @@
+from sqlalchemy import Engine, column, table, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlmodel import Session
+from typing import List, Tuple
+import weakref
+
+FTS_TABLE = "product_fts"
+
+# Lightweight handle used to join the FTS5 table into ORM queries
+product_fts = table(FTS_TABLE, column("rowid"), column("rank"))
+
+# The trigram tokenizer makes MATCH behave like a case-insensitive substring
+# search, which keeps results identical to the old `ILIKE '%kw%'` filters.
+# Trigrams need at least three characters, shorter keywords are left to ILIKE.
+MIN_KEYWORD_LENGTH = 3
+
+_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, query,
+        content='product', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, query) VALUES (new.id, new.name, new.query);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, query) VALUES ('delete', old.id, old.name, old.query);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, query ON product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, query) VALUES ('delete', old.id, old.name, old.query);
+        INSERT INTO {FTS_TABLE}(rowid, name, query) VALUES (new.id, new.name, new.query);
+    END
+    """,
+]
+
+# PostgreSQL serves the ILIKE fallback from trigram GIN indexes instead
+_PG_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_product_query_trgm ON product USING gin (query gin_trgm_ops)",
+]
+
+# Whether the FTS5 index is available, per engine. Engines on different
+# databases (tests, benchmarks, a PostgreSQL engine) must not share the answer.
+_fts_ready = weakref.WeakKeyDictionary()
+
+
+def init_product_fts(engine: Engine) -> bool:
+    """
+    Create the FTS5 index and the triggers that keep it in sync with `product`.
+    The index is backfilled when it is created on an existing database.
+    Returns False when the database does not support FTS5.
+    """
+    if engine.dialect.name != "sqlite":
+        _fts_ready[engine] = False
+        return False
+
+    try:
+        with engine.begin() as conn:
+            created = not conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE}
+            ).first()
+            for statement in _DDL:
+                conn.execute(text(statement))
+            if created:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except OperationalError as e:
+        print(f"[WARN] Full-text index unavailable, falling back to ILIKE search: {e}")
+        _fts_ready[engine] = False
+        return False
+
+    _fts_ready[engine] = True
+    return True
+
+
+def init_product_trgm(engine: Engine) -> bool:
+    """
+    Create trigram indexes so `ILIKE '%kw%'` searches on PostgreSQL use an
+    index. Returns False when pg_trgm is not available.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+
+    try:
+        with engine.begin() as conn:
+            for statement in _PG_TRGM_DDL:
+                conn.execute(text(statement))
+    except (OperationalError, ProgrammingError) as e:
+        print(f"[WARN] pg_trgm indexes unavailable, ILIKE search will scan the product table: {e}")
+        return False
+    return True
+
+
+def rebuild_product_fts(engine: Engine) -> int:
+    """
+    Rebuild the whole index from the `product` table. Returns the number of indexed rows.
+    """
+    if not init_product_fts(engine):
+        return 0
+
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        return conn.execute(text("SELECT count(*) FROM product")).scalar_one()
+
+
+def fts_ready(session: Session) -> bool:
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+
+    ready = _fts_ready.get(engine)
+    if ready is None:
+        if engine.dialect.name != "sqlite":
+            ready = False
+        else:
+            ready = session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE}
+            ).first() is not None
+        _fts_ready[engine] = ready
+    return ready
+
+
+def split_keywords(query: str) -> Tuple[List[str], List[str]]:
+    """
+    Split a search query into keywords the index can serve and keywords
+    that are too short for trigram matching.
+    """
+    indexed, short = [], []
+    for kw in query.lower().split():
+        (indexed if len(kw) >= MIN_KEYWORD_LENGTH else short).append(kw)
+    return indexed, short
+
+
+def build_match_query(keywords: List[str]) -> str:
+    """
+    Build an FTS5 MATCH expression requiring every keyword, in any column.
+    """
+    return " ".join('"' + kw.replace('"', '""') + '"' for kw in keywords)
@@ -1,8 +1,179 @@
 from app.models.setting import Setting
+from app.models.scraper_config import ScraperConfig
+from dataclasses import dataclass, field, replace
 from sqlmodel import Session, select
 from datetime import timedelta
+from types import MappingProxyType
+from typing import Mapping, Optional
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import os
+import threading
+
+COOLDOWN_KEY = "scrape_cooldown_minutes"
+CONFIG_VERSION_KEY = "config_version"
+DEFAULT_COOLDOWN_MINUTES = 10
+# How often a worker checks whether another worker changed the config
+CONFIG_REFRESH_SECONDS = float(os.environ.get("CONFIG_REFRESH_SECONDS", "10"))
+
+
+@dataclass(frozen=True)
+class ScraperLimits:
+    rate_per_sec: Optional[float] = None
+    burst: Optional[int] = None
+    max_retries: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    enabled_scrapers: Mapping[str, bool] = field(default_factory=dict)
+    scraper_limits: Mapping[str, ScraperLimits] = field(default_factory=dict)
+    cooldown_minutes: int = DEFAULT_COOLDOWN_MINUTES
+    version: int = 0
+
+    @property
+    def cooldown(self) -> timedelta:
+        return timedelta(minutes=self.cooldown_minutes)
+
+
+def _get_setting(session: Session, key: str) -> Optional[Setting]:
+    return session.exec(select(Setting).where(Setting.key == key)).first()
+
+
+def _set_setting(session: Session, key: str, value: str) -> None:
+    setting = _get_setting(session, key)
+    if setting:
+        setting.value = value
+    else:
+        session.add(Setting(key=key, value=value))
+
 
 def get_scrape_cooldown(session: Session) -> timedelta:
-    result = session.exec(select(Setting).where(Setting.key == "scrape_cooldown_minutes")).first()
-    minutes = int(result.value) if result else 10  # default to 10 minutes
-    return timedelta(minutes=minutes)
\ No newline at end of file
+    result = _get_setting(session, COOLDOWN_KEY)
+    minutes = int(result.value) if result else DEFAULT_COOLDOWN_MINUTES
+    return timedelta(minutes=minutes)
+
+
+class ConfigStore:
+    """
+    In-memory snapshot of scraper configuration and cooldown settings.
+
+    The snapshot is loaded once at startup and replaced as a whole by the
+    write-through setters below, so readers never see a half-applied change.
+    Every write bumps the `config_version` setting; a process can compare it
+    with its own snapshot to detect that another worker changed the config,
+    which `run_refresh_loop` does periodically.
+    """
+    def __init__(self):
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._lock = threading.RLock()
+
+    def load(self, session: Session) -> ConfigSnapshot:
+        configs = session.exec(select(ScraperConfig)).all()
+        cooldown = _get_setting(session, COOLDOWN_KEY)
+        version = _get_setting(session, CONFIG_VERSION_KEY)
+
+        snapshot = ConfigSnapshot(
+            enabled_scrapers=MappingProxyType({cfg.name: cfg.enabled for cfg in configs}),
+            scraper_limits=MappingProxyType({
+                cfg.name: ScraperLimits(cfg.rate_per_sec, cfg.burst, cfg.max_retries) for cfg in configs
+            }),
+            cooldown_minutes=int(cooldown.value) if cooldown else DEFAULT_COOLDOWN_MINUTES,
+            version=int(version.value) if version else 0,
+        )
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def get(self) -> ConfigSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            from app.config.db import engine
+            with Session(engine) as session:
+                snapshot = self.load(session)
+        return snapshot
+
+    def is_stale(self, session: Session) -> bool:
+        version = _get_setting(session, CONFIG_VERSION_KEY)
+        return (int(version.value) if version else 0) != self.get().version
+
+    def reload_if_stale(self, session: Session) -> ConfigSnapshot:
+        if self.is_stale(session):
+            return self.load(session)
+        return self.get()
+
+    def refresh(self) -> ConfigSnapshot:
+        from app.config.db import engine
+        with Session(engine) as session:
+            return self.reload_if_stale(session)
+
+    async def run_refresh_loop(self, interval: float = CONFIG_REFRESH_SECONDS) -> None:
+        """
+        Pick up config changes made by other workers. Meant to run as a background task.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self.refresh)
+            except Exception as e:
+                print(f"[ERROR] Config refresh failed: {e}")
+
+    def _commit(self, session: Session, **changes) -> ConfigSnapshot:
+        # Caller holds the lock
+        current = self._snapshot or self.get()
+        version = _get_setting(session, CONFIG_VERSION_KEY)
+        new_version = max(int(version.value) if version else 0, current.version) + 1
+        _set_setting(session, CONFIG_VERSION_KEY, str(new_version))
+        session.commit()
+
+        self._snapshot = replace(current, version=new_version, **changes)
+        return self._snapshot
+
+    def set_scraper_enabled(self, session: Session, name: str, enabled: bool) -> bool:
+        """
+        Enable or disable a scraper. Returns False if the scraper does not exist.
+        """
+        with self._lock:
+            config = session.exec(select(ScraperConfig).where(ScraperConfig.name == name)).first()
+            if not config:
+                return False
+            config.enabled = enabled
+
+            enabled_scrapers = dict((self._snapshot or self.get()).enabled_scrapers)
+            enabled_scrapers[name] = enabled
+            self._commit(session, enabled_scrapers=MappingProxyType(enabled_scrapers))
+            return True
+
+    def set_scraper_limits(
+        self,
+        session: Session,
+        name: str,
+        rate_per_sec: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_retries: Optional[int] = None,
+    ) -> bool:
+        """
+        Set a scraper's upstream rate limits, `None` restores the default.
+        Returns False if the scraper does not exist.
+        """
+        with self._lock:
+            config = session.exec(select(ScraperConfig).where(ScraperConfig.name == name)).first()
+            if not config:
+                return False
+            config.rate_per_sec = rate_per_sec
+            config.burst = burst
+            config.max_retries = max_retries
+
+            scraper_limits = dict((self._snapshot or self.get()).scraper_limits)
+            scraper_limits[name] = ScraperLimits(rate_per_sec, burst, max_retries)
+            self._commit(session, scraper_limits=MappingProxyType(scraper_limits))
+            return True
+
+    def set_cooldown(self, session: Session, minutes: int) -> None:
+        with self._lock:
+            _set_setting(session, COOLDOWN_KEY, str(minutes))
+            self._commit(session, cooldown_minutes=minutes)
+
+
+# Create a global instance of the config store
+config_store = ConfigStore()
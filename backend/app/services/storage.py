@@ -1,18 +1,61 @@
 from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from app.models.product import Product
-from app.models.click import Click
+from app.models.click import Click, ProductClickCount
 from app.models.api_request_log import ApiRequestLog
+from app.services.search_index import product_fts, fts_ready, split_keywords, build_match_query
+from app.services.result_cache import result_cache
 
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, text, delete, insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from dataclasses import asdict, is_dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 
-class StorageManager:
-    def __init__(self, session: Session):
+# Number of stored products served per source by /search
+SEARCH_RESULT_LIMIT = 25
+
+
+def latest_timestamp(products: List[Product]) -> Optional[datetime]:
+    """
+    Timestamp of the most recently scraped product, as an aware UTC datetime.
+    """
+    if not products:
+        return None
+    return max(
+        p.timestamp.replace(tzinfo=timezone.utc) if p.timestamp.tzinfo is None else p.timestamp
+        for p in products
+    )
+
+# Rows per INSERT ... ON CONFLICT statement, keeps the number of bound
+# parameters well below the SQLite and PostgreSQL limits
+UPSERT_CHUNK_SIZE = 500
+
+# INSERT constructs supporting ON CONFLICT, per database backend
+UPSERT_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+class BaseStorageManager:
+    """
+    Statement building shared by the sync and async storage managers.
+    """
+    def __init__(self, session):
         self.session = session
 
+    @property
+    def dialect(self) -> str:
+        return self.session.get_bind().dialect.name
+
+    def _upsert_insert(self, model):
+        upsert_insert = UPSERT_INSERTS.get(self.dialect)
+        if upsert_insert is None:
+            raise NotImplementedError(f"Upserts are not supported on {self.dialect}")
+        return upsert_insert(model)
 
     def _prepare_entry(self, item):
         # Assuming item is a Product instance or a dictionary
@@ -23,6 +66,149 @@ class StorageManager:
         #    item["timestamp"] = datetime.now().isoformat()
         return item
 
+    def _product_rows(self, prepared_entries: List[Product]) -> dict:
+        """
+        Column values per `(url, source)` key in first-seen order, the last
+        entry's values win.
+        """
+        # A statement may not update the same row twice, keep the last entry per key.
+        # Assigning an existing key keeps its position, so duplicates do not reorder.
+        rows = {}
+        for p in prepared_entries:
+            key = (p.url, p.source)
+            rows[key] = {
+                "name": p.name,
+                "price": p.price,
+                "url": p.url,
+                "rating": p.rating,
+                "review_count": p.review_count,
+                "query": p.query,
+                "source": p.source,
+                "timestamp": p.timestamp,
+            }
+        return rows
+
+    def _upsert_products_statement(self, values: List[dict]):
+        """
+        Insert or update one chunk of products with a single
+        INSERT ... ON CONFLICT ... RETURNING statement.
+        """
+        stmt = self._upsert_insert(Product).values(values)
+        return stmt.on_conflict_do_update(
+            index_elements=[Product.url, Product.source],
+            set_={
+                "name": stmt.excluded.name,
+                "price": stmt.excluded.price,
+                "rating": stmt.excluded.rating,
+                "review_count": stmt.excluded.review_count,
+                "timestamp": stmt.excluded.timestamp,
+            },
+        ).returning(Product)
+
+    def _finish_save(self, prepared_entries: List[Product], rows: dict, saved: dict) -> List[Product]:
+        # Cached /search lookups for these queries are now stale
+        for query in {p.query for p in prepared_entries}:
+            result_cache.invalidate_query(query)
+
+        print(f"[INFO] Saved {len(prepared_entries)} entries to the database.")
+        return [saved[key] for key in rows]
+
+    def _products_statement(self, stmt, query, source, min_price, max_price, limit, use_fts: bool):
+
+        if query:
+            keywords = query.lower().split()
+
+            if use_fts:
+                # Let the full-text index find and rank the candidates
+                keywords, short_keywords = split_keywords(query)
+                if keywords:
+                    stmt = (
+                        stmt.join(product_fts, product_fts.c.rowid == Product.id)
+                        .where(text("product_fts MATCH :fts_match").bindparams(fts_match=build_match_query(keywords)))
+                        .order_by(product_fts.c.rank)
+                    )
+                keywords = short_keywords
+
+            conditions = [
+                or_(
+                    Product.name.ilike(f"%{kw}%"),
+                    Product.query.ilike(f"%{kw}%")
+                )
+                for kw in keywords
+            ]
+            if conditions:
+                stmt = stmt.where(and_(*conditions))
+        if source:
+            stmt = stmt.where(Product.source == source)
+        if min_price is not None:
+            stmt = stmt.where(Product.price >= min_price)
+        if max_price is not None:
+            stmt = stmt.where(Product.price <= max_price)
+
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        return stmt
+
+    def _products_with_noc_statement(
+        self,
+        query: Optional[str],
+        source: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        limit: Optional[int],
+        use_counter: bool,
+        use_fts: bool,
+    ):
+        """
+        Products together with their number of clicks, in a single query.
+
+        With `use_counter` the all-time count is read from `ProductClickCount`
+        instead of counting `Click` rows. The counter has no time dimension, so
+        it is only used when no date range is given.
+        """
+        if use_counter and not start_date and not end_date:
+            noc = func.coalesce(ProductClickCount.count, 0).label("noc")
+            stmt = (
+                select(Product, noc)
+                .outerjoin(ProductClickCount, ProductClickCount.product_id == Product.id)
+            )
+        else:
+            click_conditions = [Click.product_id == Product.id]
+            if start_date:
+                click_conditions.append(Click.timestamp >= start_date)
+            if end_date:
+                click_conditions.append(Click.timestamp <= end_date)
+
+            noc = func.count(Click.id).label("noc")
+            stmt = (
+                select(Product, noc)
+                .outerjoin(Click, and_(*click_conditions))
+                .group_by(Product.id)
+            )
+
+        return self._products_statement(stmt, query, source, min_price, max_price, limit, use_fts)
+
+    @staticmethod
+    def _with_noc(rows) -> list:
+        enriched_products = []
+        for product, noc in rows:
+            product_dict = product.model_dump()
+            product_dict["noc"] = noc
+            enriched_products.append(product_dict)
+
+        return enriched_products
+
+
+class SyncStorageManager(BaseStorageManager):
+    """
+    Storage on a sync `Session`, for worker threads and commands.
+    """
+    def __init__(self, session: Session):
+        self.session = session
+
     def add_or_update_product(self, product_data: Product) -> Product:
         existing = self.session.exec(
             select(Product).where(
@@ -35,6 +221,8 @@ class StorageManager:
             # Update the existing record
             existing.name = product_data.name
             existing.price = product_data.price
+            existing.rating = product_data.rating
+            existing.review_count = product_data.review_count
             existing.timestamp = product_data.timestamp
         else:
             self.session.add(product_data)
@@ -45,45 +233,145 @@ class StorageManager:
 
 
     def save_products(self, entries: List[Product]) -> List[Product]:
+        """
+        Insert new products and update known ones, keyed on `(url, source)`.
+        Returns the stored rows, loaded from the database, in input order;
+        duplicate keys appear once, at their first position.
+        """
         if not entries:
             return []
 
         prepared_entries = [self._prepare_entry(e) for e in entries]
+        rows = self._product_rows(prepared_entries)
 
-        # Extract URLs and sources for batch query
-        urls_sources = [(p.url, p.source) for p in prepared_entries]
+        values = list(rows.values())
+        saved = {}
+        for i in range(0, len(values), UPSERT_CHUNK_SIZE):
+            stmt = self._upsert_products_statement(values[i:i + UPSERT_CHUNK_SIZE])
+            # populate_existing refreshes products already loaded in this session
+            for product in self.session.exec(stmt, execution_options={"populate_existing": True}).scalars().all():
+                saved[(product.url, product.source)] = product
+        self.session.commit()
 
-        # Query existing products in batch
-        from sqlalchemy import tuple_
-        existing_products = self.session.exec(
-            select(Product).where(
-                tuple_(Product.url, Product.source).in_(urls_sources)
-            )
-        ).all()
+        return self._finish_save(prepared_entries, rows, saved)
 
-        # Create a lookup dictionary for existing products
-        existing_lookup = {(p.url, p.source): p for p in existing_products}
+    def get_products(
+        self,
+        query: Optional[str] = None,
+        source: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> list[Product]:
+        stmt = self._products_statement(
+            select(Product), query, source, min_price, max_price, limit, fts_ready(self.session)
+        )
+        return self.session.exec(stmt).all()
+
+    def get_products_with_noc(
+        self,
+        query: Optional[str] = None,
+        source: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        use_counter: bool = False,
+    ) -> list:
+        stmt = self._products_with_noc_statement(
+            query, source, min_price, max_price, start_date, end_date, limit, use_counter, fts_ready(self.session)
+        )
+        return self._with_noc(self.session.exec(stmt).all())
 
-        saved_products = []
+    def add_clicks(self, clicks: List[Click]) -> None:
+        """
+        Insert clicks and bump the per-product click counters in one transaction.
+        """
+        if not clicks:
+            return
 
-        for product in prepared_entries:
-            key = (product.url, product.source)
-            if key in existing_lookup:
-                existing = existing_lookup[key]
-                existing.name = product.name
-                existing.price = product.price
-                existing.timestamp = product.timestamp
-                saved_products.append(existing)
-            else:
-                self.session.add(product)
-                saved_products.append(product)
+        self.session.exec(
+            insert(Click),
+            params=[{"product_id": click.product_id, "timestamp": click.timestamp} for click in clicks]
+        )
 
+        per_product = {}
+        for click in clicks:
+            per_product[click.product_id] = per_product.get(click.product_id, 0) + 1
+
+        stmt = self._upsert_insert(ProductClickCount).values(
+            [{"product_id": product_id, "count": count} for product_id, count in per_product.items()]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductClickCount.product_id],
+            set_={"count": ProductClickCount.count + stmt.excluded.count},
+        )
+        self.session.exec(stmt)
         self.session.commit()
 
-        print(f"[INFO] Saved {len(prepared_entries)} entries to the database.")
-        return saved_products
+    def rebuild_click_counts(self) -> int:
+        """
+        Recompute every per-product click counter from the `Click` table.
+        Returns the number of products with at least one click.
+        """
+        self.session.exec(delete(ProductClickCount))
+        # Count in the database instead of loading every product's count
+        result = self.session.exec(
+            insert(ProductClickCount).from_select(
+                ["product_id", "count"],
+                select(Click.product_id, func.count()).group_by(Click.product_id),
+            )
+        )
+        self.session.commit()
+        return result.rowcount
 
-    def get_products(
+    def ensure_click_counts(self) -> None:
+        """
+        Build the click counters on databases that predate them.
+        """
+        has_counters = self.session.exec(select(ProductClickCount.product_id).limit(1)).first() is not None
+        has_clicks = self.session.exec(select(Click.id).limit(1)).first() is not None
+        if has_clicks and not has_counters:
+            self.rebuild_click_counts()
+
+
+class StorageManager(BaseStorageManager):
+    """
+    Storage on an `AsyncSession`, so request handlers and scrape jobs never
+    block the event loop while the database works.
+    """
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _fts_ready(self) -> bool:
+        return await self.session.run_sync(fts_ready)
+
+    async def save_products(self, entries: List[Product]) -> List[Product]:
+        """
+        Insert new products and update known ones, keyed on `(url, source)`.
+        Returns the stored rows, loaded from the database, in input order;
+        duplicate keys appear once, at their first position.
+        """
+        if not entries:
+            return []
+
+        prepared_entries = [self._prepare_entry(e) for e in entries]
+        rows = self._product_rows(prepared_entries)
+
+        values = list(rows.values())
+        saved = {}
+        for i in range(0, len(values), UPSERT_CHUNK_SIZE):
+            stmt = self._upsert_products_statement(values[i:i + UPSERT_CHUNK_SIZE])
+            # populate_existing refreshes products already loaded in this session
+            result = await self.session.exec(stmt, execution_options={"populate_existing": True})
+            for product in result.scalars().all():
+                saved[(product.url, product.source)] = product
+        await self.session.commit()
+
+        return self._finish_save(prepared_entries, rows, saved)
+
+    async def get_products(
         self,
         query: Optional[str] = None,
         source: Optional[str] = None,
@@ -91,36 +379,29 @@ class StorageManager:
         max_price: Optional[float] = None,
         limit: Optional[int] = None,
     ) -> list[Product]:
-        stmt = select(Product)
+        stmt = self._products_statement(
+            select(Product), query, source, min_price, max_price, limit, await self._fts_ready()
+        )
+        return (await self.session.exec(stmt)).all()
 
-        if query:
-            # stmt = stmt.where(
-            #     (Product.query.ilike(f"%{query}%")) |
-            #     (Product.name.ilike(f"%{query}%"))
-            # )
-
-            keywords = query.lower().split()
-            conditions = [
-                or_(
-                    Product.name.ilike(f"%{kw}%"),
-                    Product.query.ilike(f"%{kw}%")
-                )
-                for kw in keywords
-            ]
-            stmt = stmt.where(and_(*conditions))
-        if source:
-            stmt = stmt.where(Product.source == source)
-        if min_price is not None:
-            stmt = stmt.where(Product.price >= min_price)
-        if max_price is not None:
-            stmt = stmt.where(Product.price <= max_price)
-
-        if limit is not None:
-            stmt = stmt.limit(limit)
-
-        return self.session.exec(stmt).all()
+    async def get_search_results(
+        self,
+        query: Optional[str],
+        source: str,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> List[Product]:
+        """
+        Stored products served for a search, from the result cache when possible.
+        """
+        cache_key = result_cache.make_key(query, source, min_price, max_price)
+        cached = result_cache.get(cache_key)
+        if cached is None:
+            cached = await self.get_products(query, source=source, limit=SEARCH_RESULT_LIMIT, min_price=min_price, max_price=max_price)
+            result_cache.set(cache_key, cached)
+        return cached
 
-    def get_products_with_noc(
+    async def get_products_with_noc(
         self,
         query: Optional[str] = None,
         source: Optional[str] = None,
@@ -129,14 +410,9 @@ class StorageManager:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: Optional[int] = None,
+        use_counter: bool = False,
     ) -> list:
-        products = self.get_products(query, source, min_price, max_price, limit)
-
-        enriched_products = []
-        for product in products:
-            noc = product.noc(self.session, start_date=start_date, end_date=end_date)
-            product_dict = product.model_dump()
-            product_dict["noc"] = noc
-            enriched_products.append(product_dict)
-
-        return enriched_products
+        stmt = self._products_with_noc_statement(
+            query, source, min_price, max_price, start_date, end_date, limit, use_counter, await self._fts_ready()
+        )
+        return self._with_noc((await self.session.exec(stmt)).all())
@@ -0,0 +1,32 @@
+from sqlalchemy import insert
+from sqlmodel import Session
+from typing import List
+from app.config.db import engine
+from app.models.visitor import Visitor
+from app.services.batch_writer import BatchWriter
+import os
+
+VISITOR_FLUSH_EVENTS = int(os.environ.get("VISITOR_FLUSH_EVENTS", "200"))
+VISITOR_FLUSH_INTERVAL_MS = int(os.environ.get("VISITOR_FLUSH_INTERVAL_MS", "1000"))
+VISITOR_QUEUE_SIZE = int(os.environ.get("VISITOR_QUEUE_SIZE", "10000"))
+VISITOR_DROP_POLICY = os.environ.get("VISITOR_DROP_POLICY", "drop_newest")
+
+
+def persist_visitors(visitors: List[Visitor]) -> None:
+    with Session(engine) as session:
+        session.exec(
+            insert(Visitor),
+            params=[v.model_dump(exclude={"id"}) for v in visitors]
+        )
+        session.commit()
+
+
+# Create a global instance of the visitor writer
+visitor_writer = BatchWriter(
+    "visitors",
+    persist_visitors,
+    max_batch=VISITOR_FLUSH_EVENTS,
+    flush_interval_ms=VISITOR_FLUSH_INTERVAL_MS,
+    max_queue=VISITOR_QUEUE_SIZE,
+    drop_policy=VISITOR_DROP_POLICY,
+)
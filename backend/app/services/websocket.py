@@ -1,39 +1,209 @@
+from collections import OrderedDict, deque
 from fastapi import WebSocket
-from typing import Dict, List, Set, Any
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple, Any
+from app.services.pubsub import PUBSUB_BACKEND, create_pubsub
 import json
+import os
+import time
 import uuid
 import asyncio
 from datetime import datetime
 
+# Messages buffered per connection before the overflow policy applies
+WS_SEND_QUEUE_SIZE = int(os.environ.get("WS_SEND_QUEUE_SIZE", "64"))
+# A connection whose socket takes longer than this to accept one message is evicted
+WS_SEND_TIMEOUT_SECONDS = float(os.environ.get("WS_SEND_TIMEOUT_SECONDS", "10"))
+# What to do when a connection's queue is full: "evict" closes the connection,
+# "drop_oldest" discards its oldest queued message
+WS_OVERFLOW_POLICY = os.environ.get("WS_OVERFLOW_POLICY", "evict").lower()
+
+# Close code sent to evicted slow consumers (policy violation)
+SLOW_CONSUMER_CLOSE_CODE = 1008
+
+# Messages broadcast to a search are kept this long for sockets that subscribe
+# late, within a total size budget (serialized characters). A TTL of 0 disables replay.
+WS_REPLAY_TTL_SECONDS = float(os.environ.get("WS_REPLAY_TTL_SECONDS", "60"))
+WS_REPLAY_MAX_BYTES = int(os.environ.get("WS_REPLAY_MAX_BYTES", str(8 * 1024 * 1024)))
+
+
+class ReplayBuffer:
+    """
+    Recent messages per search ID, replayed to sockets that subscribe after
+    they were broadcast. Clients call `/search` before opening the socket,
+    so the first pages of a scrape are often sent before anyone listens.
+
+    Messages expire after `ttl` seconds. When the total size exceeds
+    `max_bytes` the oldest messages of the least recently updated searches
+    are dropped first.
+    """
+    def __init__(self, ttl: float = WS_REPLAY_TTL_SECONDS, max_bytes: int = WS_REPLAY_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # Ordered by last append, so the searches that expire first are at the front
+        self._searches: "OrderedDict[str, Deque[Tuple[float, str]]]" = OrderedDict()
+        self._bytes = 0
+
+        self._buffered = 0
+        self._replayed = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def append(self, search_id: str, message: str) -> None:
+        if self.ttl <= 0 or len(message) > self.max_bytes:
+            return
+        now = time.monotonic()
+        self._expire(now)
+
+        messages = self._searches.get(search_id)
+        if messages is None:
+            messages = self._searches[search_id] = deque()
+        else:
+            self._searches.move_to_end(search_id)
+        messages.append((now + self.ttl, message))
+        self._bytes += len(message)
+        self._buffered += 1
+
+        while self._bytes > self.max_bytes:
+            oldest_id, oldest = next(iter(self._searches.items()))
+            _, dropped = oldest.popleft()
+            self._bytes -= len(dropped)
+            self._evicted += 1
+            if not oldest:
+                del self._searches[oldest_id]
+
+    def get(self, search_id: str) -> List[str]:
+        """
+        Unexpired messages for a search, oldest first.
+        """
+        now = time.monotonic()
+        self._expire(now)
+        messages = [message for expires, message in self._searches.get(search_id, ()) if expires > now]
+        self._replayed += len(messages)
+        return messages
+
+    def _expire(self, now: float) -> None:
+        while self._searches:
+            search_id, messages = next(iter(self._searches.items()))
+            if messages[-1][0] > now:
+                break
+            del self._searches[search_id]
+            self._bytes -= sum(len(message) for _, message in messages)
+            self._expired += len(messages)
+
+    def stats(self) -> dict:
+        return {
+            "searches": len(self._searches),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "buffered": self._buffered,
+            "replayed": self._replayed,
+            "expired": self._expired,
+            "evicted": self._evicted,
+        }
+
+
+class Connection:
+    """
+    One WebSocket with its outbound queue. Only the writer task sends on the
+    socket, so a slow client never holds up whoever is broadcasting.
+    """
+    def __init__(self, websocket: WebSocket, search_id: str, queue_size: int):
+        self.websocket = websocket
+        self.search_id = search_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+
+
 class ConnectionManager:
     """
     Manages WebSocket connections and broadcasts messages to connected clients.
+
+    A broadcast serializes the message once and puts it on the queue of every
+    subscriber without waiting on any socket. Each connection has a writer
+    task draining its queue. When a queue is full the overflow policy either
+    evicts the connection or drops its oldest message; a send that takes
+    longer than `send_timeout` or fails always evicts the connection.
+
+    Broadcasts go through a pub/sub backend so they also reach clients
+    connected to other worker processes. Messages for a search are kept in a
+    replay buffer and sent to sockets that subscribe to it later.
     """
-    def __init__(self):
-        # Maps connection_id to WebSocket instance
-        self.active_connections: Dict[str, WebSocket] = {}
+    def __init__(
+        self,
+        queue_size: int = WS_SEND_QUEUE_SIZE,
+        send_timeout: float = WS_SEND_TIMEOUT_SECONDS,
+        overflow_policy: str = WS_OVERFLOW_POLICY,
+        pubsub_backend: str = PUBSUB_BACKEND,
+        replay_buffer: Optional[ReplayBuffer] = None,
+    ):
+        # Maps connection_id to its connection
+        self.active_connections: Dict[str, Connection] = {}
         # Maps search_id to set of connection_ids
         self.search_subscriptions: Dict[str, Set[str]] = {}
         # Maps connection_id to search_id
         self.connection_searches: Dict[str, str] = {}
-        
+
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.overflow_policy = overflow_policy
+        # Close tasks of evicted connections, referenced until they finish
+        self._closing: Set[asyncio.Task] = set()
+
+        self._connected = 0
+        self._broadcasts = 0
+        self._enqueued = 0
+        self._sent = 0
+        self._dropped = 0
+        self._evicted: Dict[str, int] = {"queue_full": 0, "send_timeout": 0, "send_error": 0}
+
+        self.replay = replay_buffer or ReplayBuffer()
+        self.pubsub = create_pubsub(self._deliver, pubsub_backend)
+
+    async def start(self) -> None:
+        await self.pubsub.start()
+
+    async def stop(self) -> None:
+        await self.pubsub.stop()
+
     async def connect(self, websocket: WebSocket, search_id: str) -> str:
         """
         Accept a new WebSocket connection and register it with a search ID.
-        Returns a unique connection ID.
+        The client is sent a confirmation followed by the messages already
+        broadcast to the search. Returns a unique connection ID.
         """
         await websocket.accept()
         connection_id = str(uuid.uuid4())
-        self.active_connections[connection_id] = websocket
-        
+
+        # Nothing below yields, so every message reaches the client exactly
+        # once: either from the replay buffer or live
+        replayed = self.replay.get(search_id)
+        # Make room for the replay on top of the usual queue bound
+        connection = Connection(websocket, search_id, self.queue_size + len(replayed) + 1)
+        connection.writer = asyncio.create_task(self._writer(connection_id, connection))
+        self.active_connections[connection_id] = connection
+        self._connected += 1
+
         # Register this connection for the search ID
         if search_id not in self.search_subscriptions:
             self.search_subscriptions[search_id] = set()
         self.search_subscriptions[search_id].add(connection_id)
         self.connection_searches[connection_id] = search_id
-        
+
+        # Send initial connection confirmation with search_id
+        self._enqueue(connection_id, json.dumps({
+            "type": "connection_established",
+            "connection_id": connection_id,
+            "search_id": search_id,
+            "replayed": len(replayed),
+        }))
+        for message in replayed:
+            self._enqueue(connection_id, message)
+
         return connection_id
-        
+
     def disconnect(self, connection_id: str) -> None:
         """
         Remove a connection when it's closed.
@@ -47,12 +217,72 @@ class ConnectionManager:
                 # Clean up empty subscription sets
                 if not self.search_subscriptions[search_id]:
                     del self.search_subscriptions[search_id]
-            
+
             # Remove from active connections and connection mapping
-            del self.active_connections[connection_id]
+            connection = self.active_connections.pop(connection_id)
+            if connection.writer is not None and connection.writer is not asyncio.current_task():
+                connection.writer.cancel()
             if connection_id in self.connection_searches:
                 del self.connection_searches[connection_id]
-    
+
+    def _evict(self, connection_id: str, reason: str) -> None:
+        connection = self.active_connections.get(connection_id)
+        if connection is None:
+            return
+        self._evicted[reason] += 1
+        print(f"[WARN] Evicting WebSocket connection {connection_id} ({reason})")
+        self.disconnect(connection_id)
+
+        task = asyncio.create_task(self._close(connection.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket) -> None:
+        try:
+            await asyncio.wait_for(websocket.close(code=SLOW_CONSUMER_CLOSE_CODE), self.send_timeout)
+        except Exception:
+            # The client is gone or stalled, there is nobody left to tell
+            pass
+
+    async def _writer(self, connection_id: str, connection: Connection) -> None:
+        while True:
+            message = await connection.queue.get()
+            try:
+                await asyncio.wait_for(connection.websocket.send_text(message), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(connection_id, "send_timeout")
+                return
+            except Exception:
+                # Closed sockets raise RuntimeError, WebSocketDisconnect or transport errors
+                self._evict(connection_id, "send_error")
+                return
+            connection.sent += 1
+            self._sent += 1
+
+    def _enqueue(self, connection_id: str, message: str) -> bool:
+        connection = self.active_connections.get(connection_id)
+        if connection is None:
+            return False
+
+        if connection.queue.full():
+            if self.overflow_policy != "drop_oldest":
+                self._evict(connection_id, "queue_full")
+                return False
+            connection.queue.get_nowait()
+            connection.dropped += 1
+            self._dropped += 1
+
+        connection.queue.put_nowait(message)
+        self._enqueued += 1
+        return True
+
+    async def send_to_connection(self, connection_id: str, message: Any) -> bool:
+        """
+        Queue a message for one connection, as is. Returns False if the
+        connection is gone.
+        """
+        return self._enqueue(connection_id, message if isinstance(message, str) else json.dumps(message))
+
     # For SQLModel objects, explicitly handle SQLAlchemy attributes
     def sqlmodel_to_dict(self, model):
         """Convert SQLModel object to dictionary, handling relationships properly"""
@@ -78,74 +308,92 @@ class ConnectionManager:
             return obj.isoformat() 
         raise TypeError("Type not serializable") 
 
+    def _serialize(self, message: Any) -> str:
+        """
+        Wrap a message with a timestamp and encode it as JSON. Strings are sent as is.
+        """
+        if isinstance(message, str):
+            return message
+
+        if hasattr(message, "model_dump"):
+            # For Pydantic models
+            data = message.model_dump(mode="json")
+        elif hasattr(message, "__dict__"):
+            # For regular classes
+            data = message.__dict__
+        else:
+            # For dictionaries and other JSON-serializable objects
+            data = message
+        return json.dumps({
+            "timestamp": datetime.now().isoformat(),
+            "data": data
+        })
+
     async def broadcast_to_search(self, search_id: str, message: Any) -> None:
         """
         Send a message to all connections subscribed to a specific search ID.
         """
-        if search_id not in self.search_subscriptions:
+        await self.broadcast_to_searches([search_id], message)
+
+    async def broadcast_to_searches(self, search_ids: Iterable[str], message: Any) -> None:
+        """
+        Send one message to all connections subscribed to any of the search IDs,
+        in this process and, with a shared pub/sub backend, in other workers.
+        The message is serialized once however many connections receive it.
+        """
+        # Published even without subscribers, the replay buffer keeps it for late sockets
+        search_ids = list(search_ids)
+        if not search_ids:
             return
-            
-        # Convert message to JSON if it's not already a string
-        if not isinstance(message, str):
-            if hasattr(message, "model_dump"):
-                # For Pydantic models
-                message_str = json.dumps({
-                    "timestamp": datetime.now().isoformat(),
-                    "data": message.model_dump(mode="json")
-                })
-            elif hasattr(message, "__dict__"):
-                # For regular classes
-                message_str = json.dumps({
-                    "timestamp": datetime.now().isoformat(),
-                    "data": message.__dict__
-                })
-            else:
-                # For dictionaries and other JSON-serializable objects
-                message_str = json.dumps({
-                    "timestamp": datetime.now().isoformat(),
-                    "data": message
-                })
-        else:
-            message_str = message
-            
-        disconnected = set()
-        # Send to all subscribers
-        for connection_id in self.search_subscriptions[search_id]:
-            if connection_id in self.active_connections:
-                try:
-                    await self.active_connections[connection_id].send_text(message_str)
-                except RuntimeError:
-                    # Connection might be closed or invalid
-                    disconnected.add(connection_id)
-            else:
-                disconnected.add(connection_id)
-                
-        # Clean up any disconnected connections
-        for connection_id in disconnected:
-            self.disconnect(connection_id)
-            
+
+        self._broadcasts += 1
+        await self.pubsub.publish(search_ids, self._serialize(message))
+
     async def broadcast_to_all(self, message: Any) -> None:
         """
         Send a message to all active connections.
         """
-        if not isinstance(message, str):
-            message_str = json.dumps({
-                "timestamp": datetime.now().isoformat(),
-                "data": message
-            })
+        if not self.pubsub.shared and not self.active_connections:
+            return
+
+        self._broadcasts += 1
+        await self.pubsub.publish(None, self._serialize(message))
+
+    def _deliver(self, search_ids: Optional[List[str]], message: str) -> None:
+        """
+        Queue a published message for the matching connections of this process.
+        """
+        if search_ids is None:
+            connection_ids = list(self.active_connections)
         else:
-            message_str = message
-            
-        disconnected = set()
-        for connection_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(message_str)
-            except RuntimeError:
-                disconnected.add(connection_id)
-                
-        # Clean up any disconnected connections
-        for connection_id in disconnected:
-            self.disconnect(connection_id)
+            for search_id in search_ids:
+                self.replay.append(search_id, message)
+            connection_ids = [
+                connection_id
+                for search_id in search_ids
+                for connection_id in self.search_subscriptions.get(search_id, ())
+            ]
+        for connection_id in connection_ids:
+            self._enqueue(connection_id, message)
+
+    def stats(self) -> dict:
+        depths = [connection.queue.qsize() for connection in self.active_connections.values()]
+        return {
+            "connections": len(self.active_connections),
+            "searches": len(self.search_subscriptions),
+            "connected_total": self._connected,
+            "queue_capacity": self.queue_size,
+            "queue_depth": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "overflow_policy": self.overflow_policy,
+            "broadcasts": self._broadcasts,
+            "enqueued": self._enqueued,
+            "sent": self._sent,
+            "dropped": self._dropped,
+            "evicted": dict(self._evicted),
+            "pubsub": self.pubsub.stats(),
+            "replay": self.replay.stats(),
+        }
 
 # Create a global instance of the connection manager
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
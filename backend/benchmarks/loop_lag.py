@@ -0,0 +1,183 @@
+"""
+Event loop lag while heavy queries run.
+
+Seeds a temporary SQLite database with products and clicks, then runs the
+product listing with click counts over a date range (the heaviest read the
+API serves) from several concurrent tasks, while a heartbeat task measures
+how late the event loop wakes it up. The queries run twice: on sync sessions
+called from the loop, like the endpoints used to, and on the async session
+the endpoints use now.
+
+Exits with status 1 when the worst lag of the async run exceeds
+--max-lag-ms. The regression test for this lives in
+tests/test_async_storage.py; this script is for measuring.
+
+Usage:
+    python -m benchmarks.loop_lag
+    python -m benchmarks.loop_lag --products 5000 --clicks 100000 --max-lag-ms 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config.db import async_database_url, create_async_db_engine, create_db_engine
+from app.models.click import Click
+from app.models.product import Product
+from app.services.search_index import init_product_fts
+from app.services.storage import StorageManager, SyncStorageManager
+
+WORDS = ["phone", "laptop", "shirt", "watch", "earbuds", "charger", "camera", "speaker", "keyboard", "monitor"]
+HEARTBEAT_SECONDS = 0.005
+
+
+def seed(engine, products: int, clicks: int) -> None:
+    SQLModel.metadata.create_all(engine)
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        session.exec(insert(Product), params=[
+            {
+                "name": f"{random.choice(WORDS).title()} {random.choice(WORDS)} model {i}",
+                "price": round(random.uniform(5, 1500), 2),
+                "url": f"https://example.com/p/{i}",
+                "rating": round(random.uniform(1, 5), 1),
+                "review_count": random.randint(0, 5000),
+                "query": random.choice(WORDS),
+                "source": random.choice(["flipkart", "amazon"]),
+                "timestamp": now,
+            }
+            for i in range(products)
+        ])
+        session.exec(insert(Click), params=[
+            {"product_id": random.randint(1, products), "timestamp": now - timedelta(minutes=random.randint(0, 60 * 24 * 60))}
+            for _ in range(clicks)
+        ])
+        session.commit()
+    init_product_fts(engine)
+
+
+async def heartbeat(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        lags.append(time.perf_counter() - start - HEARTBEAT_SECONDS)
+
+
+def query_params() -> dict:
+    return {
+        "query": random.choice(WORDS),
+        "start_date": datetime.now(timezone.utc) - timedelta(days=30),
+        "limit": 20,
+    }
+
+
+async def run_mode(mode: str, engine, async_engine, tasks: int, queries: int) -> Dict:
+    async def blocking_queries():
+        for _ in range(queries):
+            with Session(engine) as session:
+                SyncStorageManager(session).get_products_with_noc(**query_params())
+            await asyncio.sleep(0)
+
+    async def async_queries():
+        for _ in range(queries):
+            async with AsyncSession(async_engine) as session:
+                await StorageManager(session).get_products_with_noc(**query_params())
+
+    worker = blocking_queries if mode == "blocking" else async_queries
+    lags: List[float] = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(HEARTBEAT_SECONDS * 4)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(tasks)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+
+    lags.sort()
+    pick = lambda q: round(lags[min(len(lags) - 1, int(len(lags) * q))] * 1000, 3)
+    result = {
+        "queries": tasks * queries,
+        "seconds": round(elapsed, 3),
+        "queries_per_sec": round(tasks * queries / elapsed, 2),
+        "heartbeats": len(lags),
+        "lag_p50_ms": pick(0.5),
+        "lag_p99_ms": pick(0.99),
+        "lag_max_ms": round(lags[-1] * 1000, 3),
+    }
+    return result
+
+
+async def run(url: str, args) -> Dict:
+    engine = create_db_engine(url)
+    async_engine = create_async_db_engine(async_database_url(url))
+    try:
+        # Warm both pools and the FTS lookup so the runs only measure queries
+        await run_mode("async", engine, async_engine, 1, 1)
+        return {
+            mode: await run_mode(mode, engine, async_engine, args.tasks, args.queries)
+            for mode in ("blocking", "async")
+        }
+    finally:
+        await async_engine.dispose()
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event loop lag while heavy queries run.")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--clicks", type=int, default=50000)
+    parser.add_argument("--tasks", type=int, default=4, help="Concurrent query tasks")
+    parser.add_argument("--queries", type=int, default=3, help="Queries per task")
+    parser.add_argument("--max-lag-ms", type=float, default=100, help="Fail when the async run's worst lag is higher")
+    parser.add_argument("--output", default="output/benchmarks/loop_lag.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'loop_lag.db')}"
+        print(f"[INFO] Seeding {args.products} products and {args.clicks} clicks")
+        seed(create_db_engine(url), args.products, args.clicks)
+        # Keep the per-request log lines out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            runs = asyncio.run(run(url, args))
+    for mode, r in runs.items():
+        print(f"[INFO] {mode:<8} {r['queries_per_sec']:>8.1f} queries/s  heartbeats {r['heartbeats']:>5}  "
+              f"lag p99 {r['lag_p99_ms']} ms  max {r['lag_max_ms']} ms")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "products": args.products,
+            "clicks": args.clicks,
+            "tasks": args.tasks,
+            "queries_per_task": args.queries,
+            "heartbeat_ms": HEARTBEAT_SECONDS * 1000,
+            "max_lag_ms": args.max_lag_ms,
+        },
+        "runs": runs,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Results written to {args.output}")
+
+    if runs["async"]["lag_max_ms"] > args.max_lag_ms:
+        print(f"[ERROR] Event loop lag {runs['async']['lag_max_ms']} ms exceeds {args.max_lag_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Offline benchmarks for the provider parsing hot paths.
+
+Runs against synthetic fixtures in `benchmarks/fixtures`: Flipkart pages
+and ScrapeHero responses reconstructed by hand from the selectors and
+fields the providers read, not captured from the live sites. No network
+access is needed. The numbers compare parser changes against each other;
+they are not measurements on real pages. Results are written as JSON and
+can be compared against a previous run.
+
+Usage:
+    python -m benchmarks.parsers
+    python -m benchmarks.parsers --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from app.providers.amazon import AmazonAPIWrapper
+from app.providers.flipkart import FlipkartScraper
+from app.providers.parsing import HTML_PARSER_BACKEND
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+FLIPKART_PAGES = ["flipkart_layout1.html", "flipkart_layout2.html", "flipkart_layout3.html"]
+SCRAPEHERO_PAGES = ["scrapehero_page1.json", "scrapehero_page2.json"]
+
+# Mix of formats seen on the providers. Unparseable prices are left out,
+# their cost is dominated by the error message printed for each one.
+RAW_PRICES = ["₹1,299", "₹849", "$19.99", "$1,249.00", None, "₹12,49,999"] * 16
+
+FILTERS = {"min_price": 10, "max_price": 200}
+
+
+def load_text(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def load_json(name: str) -> dict:
+    return json.loads(load_text(name))
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object], int]]:
+    """
+    Return `(name, fn, items)` tuples, where `items` is the number of
+    records `fn` handles per call.
+    """
+    flipkart = FlipkartScraper()
+    amazon = AmazonAPIWrapper(api_key=None)
+    cases = []
+
+    for name in FLIPKART_PAGES:
+        html = load_text(name)
+        items = len(flipkart.parse_html(html, "bench"))
+        cases.append((f"flipkart.parse_html[{Path(name).stem}]", lambda html=html: flipkart.parse_html(html, "bench"), items))
+
+    all_products = []
+    for name in SCRAPEHERO_PAGES:
+        raw = load_json(name)["search_results"]
+        products = amazon.parse_results(raw, "bench")
+        all_products.extend(products)
+        cases.append((f"amazon.parse_results[{Path(name).stem}]", lambda raw=raw: amazon.parse_results(raw, "bench"), len(products)))
+
+    cases.append(("base.parse_price", lambda: [amazon.parse_price(p) for p in RAW_PRICES], len(RAW_PRICES)))
+    cases.append(("base.parse_prices", lambda: amazon.parse_prices(RAW_PRICES), len(RAW_PRICES)))
+
+    for name in FLIPKART_PAGES:
+        all_products.extend(flipkart.parse_html(load_text(name), "bench"))
+    cases.append(("base.apply_filters", lambda: amazon.apply_filters(all_products, FILTERS), len(all_products)))
+
+    return cases
+
+
+def measure(fn: Callable[[], object], items: int, iterations: int, warmup: int) -> Dict:
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    # Allocations are traced in a separate run, tracing slows everything down
+    tracemalloc.start()
+    fn()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+
+    timings.sort()
+    # Throughput is based on the fastest run, like timeit. Slower runs mostly
+    # measure interference from the rest of the machine.
+    median = timings[len(timings) // 2]
+    best = timings[0]
+    return {
+        "iterations": iterations,
+        "items": items,
+        "mean_ms": round(statistics.fmean(timings) * 1000, 4),
+        "min_ms": round(best * 1000, 4),
+        "p50_ms": round(median * 1000, 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 4),
+        "calls_per_sec": round(1 / best, 2),
+        "items_per_sec": round(items / best, 2),
+        "peak_alloc_kib": round(peak / 1024, 2),
+        "retained_kib": round(current / 1024, 2),
+        "live_blocks": blocks,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(iterations: int, warmup: int, only: str = None) -> Dict:
+    results = {}
+    for name, fn, items in build_cases():
+        if only and only not in name:
+            continue
+        results[name] = measure(fn, items, iterations, warmup)
+        r = results[name]
+        print(f"[INFO] {name:<45} {r['p50_ms']:>9.3f} ms  {r['items_per_sec']:>12.0f} items/s  peak {r['peak_alloc_kib']:>9.1f} KiB")
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser_backend": HTML_PARSER_BACKEND,
+            "iterations": iterations,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> bool:
+    """
+    Print throughput and allocation changes against a baseline run.
+    Returns False if any case got slower by more than `threshold`.
+    """
+    ok = True
+    print(f"\nCompared to {baseline['meta'].get('commit', '?')}:")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:<45} (new)")
+            continue
+
+        speed = result["items_per_sec"] / before["items_per_sec"] - 1
+        alloc = result["peak_alloc_kib"] / before["peak_alloc_kib"] - 1 if before["peak_alloc_kib"] else 0.0
+        regressed = speed < -threshold
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"  {name:<45} throughput {speed:+8.1%}  peak alloc {alloc:+8.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark provider parsing on synthetic (reconstructed) fixtures.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", help="Only run cases whose name contains this string")
+    parser.add_argument("--output", default="output/benchmarks/parsers.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed throughput drop before failing")
+    args = parser.parse_args()
+
+    current = run(args.iterations, args.warmup, args.only)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"[INFO] Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
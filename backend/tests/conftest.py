@@ -0,0 +1,83 @@
+"""
+Shared database fixtures.
+
+The suite runs on a temporary SQLite file by default. Point TEST_DATABASE_URL
+(or DATABASE_URL) at a throwaway PostgreSQL database to run it there instead;
+its tables are dropped and recreated.
+"""
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config.db import async_database_url, create_async_db_engine, create_db_engine
+from app.models import api_request_log, click, product, visitor  # noqa: F401, registers the tables
+from app.services.result_cache import result_cache
+from app.services.search_index import init_product_fts, init_product_trgm
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL") or os.environ.get("DATABASE_URL")
+DIALECT = make_url(TEST_DATABASE_URL).get_backend_name() if TEST_DATABASE_URL else "sqlite"
+
+
+def pytest_collection_modifyitems(config, items):
+    # sqlite_only / postgresql_only tests cover dialect specific paths (FTS5, pg_trgm)
+    for item in items:
+        for marker in ("sqlite_only", "postgresql_only"):
+            if item.get_closest_marker(marker) and marker != f"{DIALECT}_only":
+                item.add_marker(pytest.mark.skip(reason=f"{marker.replace('_only', '')} specific, running on {DIALECT}"))
+
+
+@pytest.fixture(scope="session")
+def database_url(tmp_path_factory):
+    if TEST_DATABASE_URL:
+        return TEST_DATABASE_URL
+    return f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+
+
+@pytest.fixture(scope="session")
+def engine(database_url):
+    engine = create_db_engine(database_url)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    init_product_fts(engine)
+    init_product_trgm(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def clean_engine(engine):
+    """
+    The test database with every table emptied.
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            tables = ", ".join(f'"{table.name}"' for table in SQLModel.metadata.sorted_tables)
+            conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        else:
+            for table in reversed(SQLModel.metadata.sorted_tables):
+                conn.execute(table.delete())
+    result_cache.clear()
+    return engine
+
+
+@pytest.fixture
+def run_async(database_url):
+    """
+    Run `fn(session)` on an AsyncSession of the test database in a fresh event
+    loop and return its result.
+    """
+    def run(fn):
+        async def main():
+            async_engine = create_async_db_engine(async_database_url(database_url))
+            try:
+                async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                    return await fn(session)
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
@@ -0,0 +1,239 @@
+"""
+The async storage layer: what the endpoints read and write through it, and
+that it does not block the event loop while the database works.
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config.db import async_database_url, create_async_db_engine, create_db_engine
+from app.models.click import Click
+from app.models.product import Product
+from app.models.visitor import Visitor
+from app.routers import clicks, visitors
+from app.services.storage import StorageManager, SyncStorageManager
+
+PRODUCTS = 1500
+CLICKS = 40000
+HEARTBEAT_SECONDS = 0.005
+# Queries per measured run, enough for blocking to stand out from timer noise
+QUERIES = 8
+
+
+@pytest.fixture
+def heavy_database_url(clean_engine, database_url):
+    """
+    The test database seeded with products and clicks for the heavy listing.
+    """
+    now = datetime.now(timezone.utc)
+    rng = random.Random(0)
+    with Session(clean_engine) as session:
+        session.exec(insert(Product), params=[
+            {
+                "name": f"Product {i}",
+                "price": float(i),
+                "url": f"https://example.com/p/{i}",
+                "rating": 4.0,
+                "review_count": 1,
+                "query": "product",
+                "source": "flipkart",
+                "timestamp": now,
+            }
+            for i in range(PRODUCTS)
+        ])
+        product_ids = session.exec(select(Product.id)).all()
+        session.exec(insert(Click), params=[
+            {"product_id": rng.choice(product_ids), "timestamp": now - timedelta(minutes=rng.randint(0, 60 * 24 * 60))}
+            for _ in range(CLICKS)
+        ])
+        session.commit()
+    return database_url
+
+
+def heavy_query_params() -> dict:
+    # Counting clicks in a date range reads every Click row
+    return {"start_date": datetime.now(timezone.utc) - timedelta(days=30), "limit": 20}
+
+
+async def max_heartbeat_gap(query) -> tuple:
+    """
+    Run `query` next to a heartbeat task. Returns its result, its duration
+    and the longest time the heartbeat went without ticking.
+    """
+    ticks = []
+    stop = asyncio.Event()
+
+    async def heartbeat():
+        while not stop.is_set():
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(HEARTBEAT_SECONDS * 3)
+    start = time.perf_counter()
+    result = await query()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+
+    during = [start] + [tick for tick in ticks if tick >= start] + [start + elapsed]
+    gap = max(b - a for a, b in zip(during, during[1:]))
+    return result, elapsed, gap
+
+
+def test_async_query_does_not_block_event_loop(heavy_database_url):
+    async def scenario():
+        async_engine = create_async_db_engine(async_database_url(heavy_database_url))
+        try:
+            async def query():
+                for _ in range(QUERIES):
+                    async with AsyncSession(async_engine) as session:
+                        results = await StorageManager(session).get_products_with_noc(**heavy_query_params())
+                return results
+
+            # Warm the connection pool so the measured run only covers the queries
+            await query()
+            return await max_heartbeat_gap(query)
+        finally:
+            await async_engine.dispose()
+
+    results, elapsed, gap = asyncio.run(scenario())
+
+    assert len(results) == 20
+    # The queries have to take long enough for blocking to be visible at all
+    assert elapsed > 10 * HEARTBEAT_SECONDS
+    # Well under the time a single query would stall a blocked loop
+    assert gap < max(4 * HEARTBEAT_SECONDS, elapsed / QUERIES / 2)
+
+
+def test_sync_query_blocks_event_loop(heavy_database_url):
+    """
+    Control: the heartbeat detects blocking when the same query runs on a
+    sync session called from the event loop.
+    """
+    async def scenario():
+        engine = create_db_engine(heavy_database_url)
+        try:
+            async def query():
+                for _ in range(QUERIES):
+                    with Session(engine) as session:
+                        results = SyncStorageManager(session).get_products_with_noc(**heavy_query_params())
+                return results
+
+            await query()
+            return await max_heartbeat_gap(query)
+        finally:
+            engine.dispose()
+
+    results, elapsed, gap = asyncio.run(scenario())
+
+    assert len(results) == 20
+    # Each blocking query stalls the heartbeat for its whole duration
+    assert gap >= elapsed / QUERIES * 0.8
+
+
+def make_product(name: str, url: str, source: str = "amazon", **fields) -> Product:
+    values = {"price": 20.0, "rating": 4.0, "review_count": 10, "query": "accessories"}
+    values.update(fields)
+    return Product(name=name, url=url, source=source, **values)
+
+
+def test_save_products_updates_known_products(clean_engine, run_async):
+    async def scenario(session):
+        storage = StorageManager(session)
+        first = await storage.save_products([make_product("Phone case", "u1"), make_product("Phone stand", "u2")])
+        second = await storage.save_products([
+            make_product("Phone stand", "u2", rating=4.5, review_count=11),
+            make_product("Desk lamp", "u3"),
+            make_product("Phone stand", "u2", rating=4.8, review_count=12),
+        ])
+        stored = await storage.get_products(source="amazon")
+        return first, second, stored
+
+    first, second, stored = run_async(scenario)
+
+    # Updated in place, duplicates keep their first position with the last values
+    assert [(p.url, p.rating, p.review_count) for p in second] == [("u2", 4.8, 12), ("u3", 4.0, 10)]
+    assert second[0].id == first[1].id
+    assert {p.url: (p.rating, p.review_count) for p in stored} == {
+        "u1": (4.0, 10), "u2": (4.8, 12), "u3": (4.0, 10),
+    }
+
+
+@pytest.mark.sqlite_only
+def test_search_results_ranked_by_full_text_index(clean_engine, run_async):
+    names = ["Leather wallet with phone pocket and card slots", "Phone case", "Phone stand for desk", "Phone case phone stand"]
+
+    async def scenario(session):
+        storage = StorageManager(session)
+        await storage.save_products([make_product(name, f"u{i}") for i, name in enumerate(names)])
+        return await storage.get_search_results("phone", "amazon")
+
+    results = run_async(scenario)
+
+    # Most matches first, then shorter names
+    assert [p.name for p in results] == [
+        "Phone case phone stand", "Phone case", "Phone stand for desk", "Leather wallet with phone pocket and card slots",
+    ]
+
+
+def test_search_results_short_keywords_fall_back_to_ilike(clean_engine, run_async):
+    names = ["TV stand oak", "Smart TV 43 inch", "Phone stand for desk", "Flipkart TV stand"]
+
+    async def scenario(session):
+        storage = StorageManager(session)
+        await storage.save_products([make_product(name, f"u{i}") for i, name in enumerate(names[:3])])
+        await storage.save_products([make_product(names[3], "u3", source="flipkart")])
+        return (
+            await storage.get_search_results("tv stand", "amazon"),
+            await storage.get_search_results("TV", "amazon", max_price=100),
+            await storage.get_search_results("tv stand", "amazon", min_price=100),
+        )
+
+    mixed, short_only, filtered = run_async(scenario)
+
+    assert [p.name for p in mixed] == ["TV stand oak"]
+    assert {p.name for p in short_only} == {"TV stand oak", "Smart TV 43 inch"}
+    assert filtered == []
+
+
+def test_click_and_visitor_counts(clean_engine, run_async):
+    now = datetime.now(timezone.utc)
+    with Session(clean_engine) as session:
+        storage = SyncStorageManager(session)
+        phone, lamp = storage.save_products([make_product("Phone case", "u1"), make_product("Desk lamp", "u2", source="flipkart")])
+        storage.add_clicks(
+            [Click(product_id=phone.id, timestamp=now - timedelta(days=40))]
+            + [Click(product_id=phone.id, timestamp=now)] * 2
+            + [Click(product_id=lamp.id, timestamp=now)]
+        )
+        session.exec(insert(Visitor), params=[{"ip": "127.0.0.1", "user_agent": "test", "path": "/search"}] * 3)
+        session.commit()
+
+    # The three /products/noc endpoints share a function name, look them up by path
+    noc_endpoints = {route.path: route.endpoint for route in clicks.router.routes}
+    last_month = {"start_date": now - timedelta(days=30), "end_date": None}
+
+    async def scenario(session):
+        storage = StorageManager(session)
+        return {
+            "counter": await storage.get_products_with_noc(use_counter=True),
+            "last_month": await storage.get_products_with_noc(**last_month),
+            "noc": await noc_endpoints["/products/noc"](session=session, start_date=None, end_date=None),
+            "noc_last_month": await noc_endpoints["/products/noc/{source}"](source="amazon", session=session, **last_month),
+            "visitors": await visitors.visitor_count(session=session),
+        }
+
+    counts = run_async(scenario)
+
+    assert {p["name"]: p["noc"] for p in counts["counter"]} == {"Phone case": 3, "Desk lamp": 1}
+    assert {p["name"]: p["noc"] for p in counts["last_month"]} == {"Phone case": 2, "Desk lamp": 1}
+    assert counts["noc"] == {"number_of_clicks": {"total": 4, "flipkart": 1, "amazon": 3}}
+    assert counts["noc_last_month"] == {"number_of_clicks": 2}
+    assert counts["visitors"] == {"total_visitors": 3}
@@ -0,0 +1,77 @@
+"""
+Dialect specific storage paths: ON CONFLICT upserts on both backends, the FTS5
+index on SQLite and the pg_trgm indexes on PostgreSQL.
+"""
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.models.click import Click, ProductClickCount
+from app.models.product import Product
+from app.services.search_index import FTS_TABLE, fts_ready
+from app.services.storage import SyncStorageManager
+
+
+def make_product(i: int, **fields) -> Product:
+    values = {
+        "name": f"Phone model {i}",
+        "price": 100.0 + i,
+        "url": f"https://example.com/p/{i}",
+        "rating": 4.0,
+        "review_count": 10,
+        "query": "phone",
+        "source": "flipkart",
+    }
+    values.update(fields)
+    return Product(**values)
+
+
+def test_save_products_upserts_on_url_and_source(clean_engine):
+    with Session(clean_engine, expire_on_commit=False) as session:
+        storage = SyncStorageManager(session)
+        first = storage.save_products([make_product(1), make_product(2)])
+        second = storage.save_products([make_product(2, price=50.0), make_product(3)])
+
+        assert second[0].id == first[1].id
+        assert second[0].price == 50.0
+        assert len(session.exec(select(Product)).all()) == 3
+
+
+def test_add_clicks_increments_counters(clean_engine):
+    with Session(clean_engine) as session:
+        storage = SyncStorageManager(session)
+        a, b = storage.save_products([make_product(1), make_product(2)])
+        storage.add_clicks([Click(product_id=a.id), Click(product_id=a.id), Click(product_id=b.id)])
+        storage.add_clicks([Click(product_id=a.id)])
+
+        counts = dict(session.exec(select(ProductClickCount.product_id, ProductClickCount.count)).all())
+        assert counts == {a.id: 3, b.id: 1}
+
+
+@pytest.mark.sqlite_only
+def test_fts5_index_follows_product_changes(clean_engine):
+    def matches(session, term):
+        return session.execute(
+            text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :term"), {"term": f'"{term}"'}
+        ).scalars().all()
+
+    with Session(clean_engine) as session:
+        assert fts_ready(session)
+        storage = SyncStorageManager(session)
+        (saved,) = storage.save_products([make_product(1, name="Walnut desk")])
+        assert matches(session, "walnut") == [saved.id]
+
+        # Renaming through the upsert moves the row in the index
+        storage.save_products([make_product(1, name="Oak desk")])
+        assert matches(session, "walnut") == []
+        assert matches(session, "oak") == [saved.id]
+
+
+@pytest.mark.postgresql_only
+def test_pg_trgm_indexes_exist(clean_engine):
+    with Session(clean_engine) as session:
+        assert not fts_ready(session)
+        indexes = set(session.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = 'product'")
+        ).scalars().all())
+    assert {"ix_product_name_trgm", "ix_product_query_trgm"} <= indexes